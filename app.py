@@ -3,19 +3,21 @@ import os
 import time
 import numpy as np
 import sounddevice as sd
-import soundfile as sf
 
 # Import all utility functions
-from utils.llm_api import get_ai_response, BASE_SYSTEM_PROMPT
+from utils.llm_api import stream_ai_response, BASE_SYSTEM_PROMPT
+from utils.llm_client import LLMError
 from utils.text_analysis import analyze_text
-from utils.crisis_detection import check_crisis
-from utils.data_storage import save_entry, plot_trends
-from utils.voice_emotion import get_voice_emotion
+from utils.crisis_detection import check_crisis, screen_message, screening_result
+from utils.data_storage import save_entry, load_journal, plot_trends
+from utils.voice_emotion import analyze_voice
 from utils.face_emotion import analyze_video_stream
 from utils.insights import analyze_journal_insights
 from utils.goals import get_todays_goals, add_goal, update_goal_status, remove_goal
 from utils.resources import RESOURCE_DATA
 from utils.memory_vault import add_memory, get_random_memory, load_memories, remove_memory
+from utils.model_registry import get_load_times
+from utils.semantic_search import find_relevant_memory
 
 # --- APP CONFIGURATION ---
 st.set_page_config(layout="wide")
@@ -27,11 +29,33 @@ app_mode = st.sidebar.selectbox(
     ["AI Companion", "Journal Analysis", "My Insights", "Daily Goals", "Memory Vault", "Resource Hub", "Guided Exercises", "Voice Emotion", "Facial Emotion"]
 )
 
+# Models are loaded on first use, so only the ones used so far show up here
+load_times = get_load_times()
+if load_times:
+    with st.sidebar.expander("Model load times"):
+        for model_name, seconds in load_times.items():
+            st.write(f"{model_name}: {seconds:.1f}s")
+
+def relevant_memory(message):
+    # Reruns (checkboxes, navigation) don't change the last message, so reuse its lookup
+    cached = st.session_state.get("relevant_memory")
+    if cached is None or cached[0] != message:
+        cached = (message, find_relevant_memory(message))
+        st.session_state.relevant_memory = cached
+    return cached[1]
+
+def show_helplines(helplines):
+    st.error("⚠️ It sounds like you're going through a lot. Please consider reaching out for help:")
+    for k, v in helplines.items():
+        st.write(f"{k}: {v}")
+
 # --- AI COMPANION CHATBOT ---
 if app_mode == "AI Companion":
     st.title("MindSight - AI Wellness Companion 💬")
 
-    random_memory = get_random_memory()
+    # Once the user has said something, show the memory closest to it instead of a random one
+    user_messages = [m["content"] for m in st.session_state.get("messages", []) if m["role"] == "user"]
+    random_memory = (relevant_memory(user_messages[-1]) if user_messages else None) or get_random_memory()
     if random_memory:
         st.info(f"✨ **Remember this happy moment?**\n\n*'{random_memory}'*")
 
@@ -59,18 +83,42 @@ if app_mode == "AI Companion":
         if message["role"] != "system":
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
+            # Kept on the message so the warning stays on screen across reruns
+            if message.get("helplines"):
+                show_helplines(message["helplines"])
 
     if prompt := st.chat_input("What's on your mind?"):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        user_message = {"role": "user", "content": prompt}
+        st.session_state.messages.append(user_message)
         with st.chat_message("user"):
             st.markdown(prompt)
 
+        # Screening runs alongside the reply, so it never delays it. Keyword hits are
+        # decided already and shown right away; borderline messages are checked after the reply.
+        screening = screen_message(prompt)
+        if screening.done():
+            crisis, helplines = screening.result()
+            if crisis:
+                user_message["helplines"] = helplines
+                show_helplines(helplines)
+
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = get_ai_response(st.session_state.messages)
-                st.markdown(response)
+            # Render the reply as it streams in rather than after it's complete
+            try:
+                response = st.write_stream(stream_ai_response(st.session_state.messages))
+            except LLMError as e:
+                # Timeouts and transient errors were already retried; nothing goes into the history
+                response = None
+                st.error(str(e))
         
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        if response is not None:
+            st.session_state.messages.append({"role": "assistant", "content": response})
+
+        if "helplines" not in user_message:
+            crisis, helplines = screening_result(screening)
+            if crisis:
+                user_message["helplines"] = helplines
+                show_helplines(helplines)
 
 # --- JOURNAL ANALYSIS & MOOD TRENDING ---
 elif app_mode == "Journal Analysis":
@@ -86,8 +134,8 @@ elif app_mode == "Journal Analysis":
             st.error("⚠️ Crisis detected! Please consider reaching out for help:")
             for k, v in helplines.items():
                 st.write(f"{k}: {v}")
-        log = save_entry(journal_entry, numeric_rating)
-        st.plotly_chart(plot_trends(log))
+        save_entry(journal_entry, numeric_rating)
+        st.plotly_chart(plot_trends(load_journal()))
 
 # --- PERSONALIZED INSIGHTS ---
 elif app_mode == "My Insights":
@@ -115,20 +163,20 @@ elif app_mode == "Daily Goals":
     if not todays_goals:
         st.write("No goals set for today. Add one above!")
     else:
-        for i, goal in enumerate(todays_goals):
+        for goal in todays_goals:
             col1, col2 = st.columns([0.9, 0.1])
             with col1:
                 is_completed = st.checkbox(
                     goal["text"], 
                     value=goal["completed"], 
-                    key=f"goal_{i}"
+                    key=f"goal_{goal['id']}"
                 )
                 if is_completed != goal["completed"]:
-                    update_goal_status(i, is_completed)
+                    update_goal_status(goal["id"], is_completed)
                     st.rerun()
             with col2:
-                if st.button("❌", key=f"remove_goal_{i}"):
-                    remove_goal(i)
+                if st.button("❌", key=f"remove_goal_{goal['id']}"):
+                    remove_goal(goal["id"])
                     st.rerun()
 
 # --- MEMORY VAULT ---
@@ -212,10 +260,14 @@ elif app_mode == "Voice Emotion":
             audio = sd.rec(int(duration * fs), samplerate=fs, channels=1)
             sd.wait()
         st.success("Recording complete! Analyzing...")
-        temp_audio_file = "temp_audio.wav"
-        sf.write(temp_audio_file, audio, fs)
-        label, confidence = get_voice_emotion(temp_audio_file)
+        voice = analyze_voice(audio, fs)
+        label, confidence = voice["emotion"], voice["confidence"]
         st.write(f"Detected Voice Emotion: **{label}** (Confidence: {confidence:.2f}%)")
+        if voice["skipped_seconds"]:
+            st.caption(f"Skipped {voice['skipped_seconds']:.1f}s of silence; analyzed {voice['speech_seconds']:.1f}s of speech.")
+        if len(voice["timeline"]) > 1:
+            st.write("Emotion over the recording:")
+            st.dataframe(voice["timeline"], use_container_width=True)
 
 # --- FACIAL EMOTION ---
 elif app_mode == "Facial Emotion":
@@ -3,19 +3,21 @@ import os
 import time
 import numpy as np
 import sounddevice as sd
-import soundfile as sf
 
 # Import all utility functions
-from utils.llm_api import get_ai_response, BASE_SYSTEM_PROMPT
+from utils.llm_api import stream_ai_response, BASE_SYSTEM_PROMPT
+from utils.llm_client import LLMError
 from utils.text_analysis import analyze_text
-from utils.crisis_detection import check_crisis
-from utils.data_storage import save_entry, plot_trends
-from utils.voice_emotion import get_voice_emotion
+from utils.crisis_detection import check_crisis, screen_message, screening_result
+from utils.data_storage import save_entry, load_journal, plot_trends, get_mood_today
+from utils.voice_emotion import analyze_voice
 from utils.face_emotion import analyze_video_stream
 from utils.insights import analyze_journal_insights
-from utils.goals import get_todays_goals, add_goal, update_goal_status, remove_goal
+from utils.goals import get_todays_goals, add_goal, update_goal_status, remove_goal, get_current_streak, get_longest_streak, get_completion_rate
 from utils.resources import RESOURCE_DATA
-from utils.memory_vault import add_memory, get_random_memory, load_memories, remove_memory
+from utils.memory_vault import add_memory, count_memories, get_random_memory, load_memories, remove_memory
+from utils.model_registry import get_load_times
+from utils.semantic_search import find_relevant_memory
 
 # --- APP CONFIGURATION ---
 st.set_page_config(
@@ -415,6 +417,19 @@ def create_feature_card(title, description, icon, action_text="Explore"):
     </div>
     """
 
+def relevant_memory(message):
+    # Reruns (checkboxes, navigation) don't change the last message, so reuse its lookup
+    cached = st.session_state.get("relevant_memory")
+    if cached is None or cached[0] != message:
+        cached = (message, find_relevant_memory(message))
+        st.session_state.relevant_memory = cached
+    return cached[1]
+
+def show_helplines(helplines):
+    st.error("⚠️ **It sounds like you're going through a lot.** Please consider reaching out for help:")
+    for k, v in helplines.items():
+        st.write(f"**{k}:** {v}")
+
 # --- NAVIGATION ---
 with st.sidebar:
     st.markdown("""
@@ -462,13 +477,20 @@ with st.sidebar:
     st.markdown("### 📊 Quick Stats")
     goals = get_todays_goals()
     completed = sum(1 for g in goals if g["completed"])
-    memories = load_memories()
+    memory_count = count_memories()
     
     col1, col2 = st.columns(2)
     with col1:
         st.metric("Goals", f"{completed}/{len(goals)}", delta=f"{completed} done")
     with col2:
-        st.metric("Memories", len(memories), delta="Growing")
+        st.metric("Memories", memory_count, delta="Growing")
+
+    # Models are loaded on first use, so only the ones used so far show up here
+    load_times = get_load_times()
+    if load_times:
+        with st.expander("⏱️ Model load times"):
+            for model_name, seconds in load_times.items():
+                st.write(f"**{model_name}:** {seconds:.1f}s")
 
 # --- DASHBOARD ---
 if "🏠" in st.session_state.app_mode:
@@ -477,16 +499,25 @@ if "🏠" in st.session_state.app_mode:
     # Enhanced stats row
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        create_metric_card("Daily Streak", "7 days", "🔥", description="Keep it up!")
+        streak = get_current_streak()
+        weekly_rate = get_completion_rate(7)
+        rate_text = f"{weekly_rate:.0%} of goals done this week" if weekly_rate is not None else "Complete a goal to start"
+        create_metric_card("Daily Streak", f"{streak} day{'' if streak == 1 else 's'}", "🔥", description=f"Best: {get_longest_streak()} · {rate_text}")
     with col2:
-        create_metric_card("Mood Today", "Great", "😊", description="Feeling positive")
+        mood_today = get_mood_today()
+        if mood_today:
+            mean = mood_today["mean"]
+            mood_label, mood_icon = ("Great", "😊") if mean >= 4 else ("Okay", "🙂") if mean >= 3 else ("Low", "😔")
+            entries = "entry" if mood_today["count"] == 1 else "entries"
+            create_metric_card("Mood Today", mood_label, mood_icon, description=f"Avg {mean:.1f}/5 from {mood_today['count']} {entries}")
+        else:
+            create_metric_card("Mood Today", "—", "📝", description="No journal entry yet")
     with col3:
         goals = get_todays_goals()
         completed = sum(1 for g in goals if g["completed"])
         create_metric_card("Goals", f"{completed}/{len(goals)}", "🎯", description="On track")
     with col4:
-        memories = load_memories()
-        create_metric_card("Memories", str(len(memories)), "✨", description="Precious moments")
+        create_metric_card("Memories", str(count_memories()), "✨", description="Precious moments")
     
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -548,7 +579,9 @@ if "🏠" in st.session_state.app_mode:
 elif "💬" in st.session_state.app_mode:
     create_welcome_header("AI Wellness Companion", "I'm here to listen and support you", "💬")
 
-    random_memory = get_random_memory()
+    # Once the user has said something, show the memory closest to it instead of a random one
+    user_messages = [m["content"] for m in st.session_state.get("messages", []) if m["role"] == "user"]
+    random_memory = (relevant_memory(user_messages[-1]) if user_messages else None) or get_random_memory()
     if random_memory:
         st.markdown(f"""
         <div style="background: rgba(255, 255, 255, 0.95); border-radius: 16px; padding: 1.5rem; margin-bottom: 2rem; box-shadow: 0 6px 20px rgba(21,128,61,0.1); border-left: 4px solid #84cc16; backdrop-filter: blur(10px);">
@@ -589,18 +622,42 @@ elif "💬" in st.session_state.app_mode:
         if message["role"] != "system":
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
+            # Kept on the message so the warning stays on screen across reruns
+            if message.get("helplines"):
+                show_helplines(message["helplines"])
 
     if prompt := st.chat_input("What's on your mind?"):
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        user_message = {"role": "user", "content": prompt}
+        st.session_state.messages.append(user_message)
         with st.chat_message("user"):
             st.markdown(prompt)
 
+        # Screening runs alongside the reply, so it never delays it. Keyword hits are
+        # decided already and shown right away; borderline messages are checked after the reply.
+        screening = screen_message(prompt)
+        if screening.done():
+            crisis, helplines = screening.result()
+            if crisis:
+                user_message["helplines"] = helplines
+                show_helplines(helplines)
+
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = get_ai_response(st.session_state.messages)
-                st.markdown(response)
+            # Render the reply as it streams in rather than after it's complete
+            try:
+                response = st.write_stream(stream_ai_response(st.session_state.messages))
+            except LLMError as e:
+                # Timeouts and transient errors were already retried; nothing goes into the history
+                response = None
+                st.error(str(e))
         
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        if response is not None:
+            st.session_state.messages.append({"role": "assistant", "content": response})
+
+        if "helplines" not in user_message:
+            crisis, helplines = screening_result(screening)
+            if crisis:
+                user_message["helplines"] = helplines
+                show_helplines(helplines)
 
 elif "📝" in st.session_state.app_mode:
     create_welcome_header("Journal Analysis", "Express yourself and track your emotional journey", "📝")
@@ -643,8 +700,8 @@ elif "📝" in st.session_state.app_mode:
                         st.write(f"**{k}:** {v}")
                 
                 # Save and plot
-                log = save_entry(journal_entry, numeric_rating)
-                st.plotly_chart(plot_trends(log), use_container_width=True)
+                save_entry(journal_entry, numeric_rating)
+                st.plotly_chart(plot_trends(load_journal()), use_container_width=True)
     
     with col2:
         st.markdown("""
@@ -713,20 +770,20 @@ elif "🎯" in st.session_state.app_mode:
             </div>
             """, unsafe_allow_html=True)
         else:
-            for i, goal in enumerate(todays_goals):
+            for goal in todays_goals:
                 col_a, col_b = st.columns([0.9, 0.1])
                 with col_a:
                     is_completed = st.checkbox(
                         goal["text"], 
                         value=goal["completed"], 
-                        key=f"goal_{i}"
+                        key=f"goal_{goal['id']}"
                     )
                     if is_completed != goal["completed"]:
-                        update_goal_status(i, is_completed)
+                        update_goal_status(goal["id"], is_completed)
                         st.rerun()
                 with col_b:
-                    if st.button("❌", key=f"remove_goal_{i}"):
-                        remove_goal(i)
+                    if st.button("❌", key=f"remove_goal_{goal['id']}"):
+                        remove_goal(goal["id"])
                         st.rerun()
     
     with col2:
@@ -892,11 +949,10 @@ elif "🎤" in st.session_state.app_mode:
                 sd.wait()
             
             st.success("Recording complete! Analyzing...")
-            temp_audio_file = "temp_audio.wav"
-            sf.write(temp_audio_file, audio, fs)
             
             with st.spinner("Analyzing your voice..."):
-                label, confidence = get_voice_emotion(temp_audio_file)
+                voice = analyze_voice(audio, fs)
+                label, confidence = voice["emotion"], voice["confidence"]
             
             # Display results
             emotion_colors = {
@@ -914,6 +970,13 @@ elif "🎤" in st.session_state.app_mode:
                 <p style="margin: 0.5rem 0 0 0; color: white;">Confidence: {confidence:.1f}%</p>
             </div>
             """, unsafe_allow_html=True)
+            
+            if voice["skipped_seconds"]:
+                st.caption(f"Skipped {voice['skipped_seconds']:.1f}s of silence; analyzed {voice['speech_seconds']:.1f}s of speech.")
+            
+            if len(voice["timeline"]) > 1:
+                st.markdown("#### 📈 Emotion Over Your Recording")
+                st.dataframe(voice["timeline"], use_container_width=True)
     
     with col2:
         st.markdown("""
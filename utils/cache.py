@@ -0,0 +1,124 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def content_key(*parts):
+    """Builds a stable cache key by hashing the given strings together."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+class LRUCache:
+    """
+    A bounded in-memory LRU cache with an optional on-disk tier.
+    Values evicted from memory stay on disk, and the disk tier survives restarts.
+    The disk tier is a small SQLite file, safe to share between processes (the app and
+    the rescore CLI), holding values as JSON, so they must be JSON-serializable (tuples come
+    back as lists). If it can't be read or written, lookups just fall back to a miss.
+    With `ttl` set, entries older than that many seconds count as misses and are dropped.
+    """
+
+    def __init__(self, maxsize=1024, disk_path=None, ttl=None):
+        self.maxsize = maxsize
+        self.disk_path = disk_path
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        # sqlite3 connections can't be shared between threads, so each thread keeps its own open
+        self._local = threading.local()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._items:
+                if self._fresh(self._items[key]):
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return self._unwrap(self._items[key])
+                del self._items[key]
+
+            if self.disk_path:
+                try:
+                    disk = self._disk()
+                    row = disk.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+                    if row:
+                        stored = json.loads(row[0])
+                        if self._fresh(stored):
+                            self.disk_hits += 1
+                            self._remember(key, stored)
+                            return self._unwrap(stored)
+                        with disk:
+                            disk.execute("DELETE FROM cache WHERE key = ?", (key,))
+                except Exception:
+                    # The disk tier is only a speed-up; a locked or damaged file counts as a miss
+                    pass
+
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        # With a TTL, values are stored alongside the time they expire
+        stored = value if self.ttl is None else (time.time() + self.ttl, value)
+        with self._lock:
+            self._remember(key, stored)
+            if self.disk_path:
+                try:
+                    disk = self._disk()
+                    with disk:
+                        disk.execute(
+                            "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", (key, json.dumps(stored))
+                        )
+                except Exception:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.disk_hits = self.misses = 0
+            if self.disk_path:
+                try:
+                    disk = self._disk()
+                    with disk:
+                        disk.execute("DELETE FROM cache")
+                except Exception:
+                    pass
+
+    def stats(self):
+        """Returns hit/miss counters and the current in-memory size."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "size": len(self._items),
+        }
+
+    def _disk(self):
+        disk = getattr(self._local, "disk", None)
+        if disk is None:
+            disk = sqlite3.connect(self.disk_path, timeout=5)
+            # WAL lets one process read while another writes
+            disk.execute("PRAGMA journal_mode=WAL")
+            disk.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._local.disk = disk
+        return disk
+
+    def _fresh(self, stored):
+        return self.ttl is None or stored[0] > time.time()
+
+    def _unwrap(self, stored):
+        return stored if self.ttl is None else stored[1]
+
+    def _remember(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
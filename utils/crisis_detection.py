@@ -1,16 +1,144 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from utils.keyword_matcher import BORDERLINE_GROUP, CRISIS_GROUP, scan_text
+from utils.model_registry import register_model, get_model
+
 # Keywords that may indicate crisis
 CRISIS_KEYWORDS = ["suicide", "kill myself", "hopeless", "depressed", "panic"]
 
+# Phrases that may or may not indicate crisis depending on context; these go to the classifier
+BORDERLINE_KEYWORDS = [
+    "can't go on", "cant go on", "no point", "give up", "worthless", "end it all",
+    "tired of living", "hurt myself", "disappear", "burden", "no way out", "alone"
+]
+
 HELPLINES = {
     "KIRAN": "1800 599 0019",
     "AASRA": "91-9820466726",
     "Snehi": "022-2772 6771"
 }
 
+# Small NLI model used zero-shot, so no crisis-specific training data is needed
+CLASSIFIER_MODEL = "typeform/distilbert-base-uncased-mnli"
+CRISIS_LABEL = "thoughts of self-harm or suicide"
+SAFE_LABEL = "everyday stress or sadness"
+# Classifier probability above which a borderline message is treated as a crisis
+CRISIS_THRESHOLD = 0.7
+# Most borderline messages classified in one forward pass
+CLASSIFIER_BATCH_SIZE = 8
+# Seconds a page waits for the classifier once the reply is shown (the first borderline
+# message also downloads and loads the model) before showing helplines to be safe
+SCREENING_TIMEOUT = 5.0
+
+def _load_crisis_classifier():
+    from transformers import pipeline
+    return pipeline("zero-shot-classification", model=CLASSIFIER_MODEL)
+
+register_model("crisis_classifier", _load_crisis_classifier)
+
 def check_crisis(text):
     # Detect crisis keywords and return helpline info
-    text_lower = text.lower()
-    for word in CRISIS_KEYWORDS:
-        if word in text_lower:
-            return True, HELPLINES
+    if CRISIS_GROUP in scan_text(text):
+        return True, HELPLINES
     return False, None
+
+def classify_borderline(texts):
+    """Runs the semantic stage on a batch of texts, returning True for each one judged a crisis."""
+    outputs = get_model("crisis_classifier")(
+        list(texts), candidate_labels=[CRISIS_LABEL, SAFE_LABEL], batch_size=CLASSIFIER_BATCH_SIZE
+    )
+    if isinstance(outputs, dict):
+        outputs = [outputs]
+    return [dict(zip(o["labels"], o["scores"]))[CRISIS_LABEL] >= CRISIS_THRESHOLD for o in outputs]
+
+# Latency counters for both stages, in seconds
+_stats = {"messages": 0, "stage1_seconds": 0.0, "stage1_max": 0.0,
+          "borderline": 0, "stage2_batches": 0, "stage2_seconds": 0.0, "stage2_max": 0.0}
+# Updated from the screening worker and from every session's thread
+_stats_lock = threading.Lock()
+_pending = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+def _run_stage2():
+    # Drains whatever borderline messages are waiting and classifies them as one batch
+    while True:
+        batch = [_pending.get()]
+        while len(batch) < CLASSIFIER_BATCH_SIZE:
+            try:
+                batch.append(_pending.get_nowait())
+            except queue.Empty:
+                break
+
+        start_time = time.perf_counter()
+        try:
+            flags = classify_borderline([text for text, _ in batch])
+        except Exception:
+            # If the classifier can't run, err on the side of showing helplines
+            flags = [True] * len(batch)
+        elapsed = time.perf_counter() - start_time
+        with _stats_lock:
+            _stats["stage2_batches"] += 1
+            _stats["stage2_seconds"] += elapsed
+            _stats["stage2_max"] = max(_stats["stage2_max"], elapsed)
+
+        for (_, future), is_crisis in zip(batch, flags):
+            future.set_result((True, HELPLINES) if is_crisis else (False, None))
+
+def screen_message(text):
+    """
+    Screens a chat message for crisis signals without holding up the reply.
+    The keyword stage runs inline; borderline messages are handed to a background
+    worker that batches them through the classifier. Returns a Future resolving to
+    (is_crisis, helplines), so callers can start the LLM call and check it afterwards.
+    """
+    global _worker
+    start_time = time.perf_counter()
+    groups = scan_text(text)
+    elapsed = time.perf_counter() - start_time
+    with _stats_lock:
+        _stats["messages"] += 1
+        _stats["stage1_seconds"] += elapsed
+        _stats["stage1_max"] = max(_stats["stage1_max"], elapsed)
+
+    future = Future()
+    if CRISIS_GROUP in groups:
+        future.set_result((True, HELPLINES))
+    elif BORDERLINE_GROUP in groups:
+        with _stats_lock:
+            _stats["borderline"] += 1
+        with _worker_lock:
+            if _worker is None:
+                _worker = threading.Thread(target=_run_stage2, name="crisis-screening", daemon=True)
+                _worker.start()
+        _pending.put((text, future))
+    else:
+        future.set_result((False, None))
+    return future
+
+def screening_result(future, timeout=SCREENING_TIMEOUT):
+    """
+    Waits up to `timeout` seconds for a screen_message result. If the classifier
+    hasn't answered by then, returns (True, HELPLINES), as when it fails.
+    """
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        return True, HELPLINES
+
+def get_screening_stats():
+    """Returns message counts and average/max latency (ms) for each screening stage."""
+    with _stats_lock:
+        stats = dict(_stats)
+    messages, batches = stats["messages"], stats["stage2_batches"]
+    return {
+        "messages": messages,
+        "borderline": stats["borderline"],
+        "stage1_avg_ms": stats["stage1_seconds"] * 1000 / messages if messages else 0.0,
+        "stage1_max_ms": stats["stage1_max"] * 1000,
+        "stage2_batches": batches,
+        "stage2_avg_ms": stats["stage2_seconds"] * 1000 / batches if batches else 0.0,
+        "stage2_max_ms": stats["stage2_max"] * 1000,
+    }
@@ -1,31 +1,168 @@
-import json
+import numpy as np
 import plotly.express as px
-from datetime import datetime
-
-def save_entry(entry, score, filename="journal_log.json"):
-    # Save journal entry with sentiment score and timestamp
-    try:
-        with open(filename, "r") as f:
-            log = json.load(f)
-    except:
-        log = []
-    
-    # Add timestamp
+from datetime import datetime, timedelta
+from utils.db import bump_version, get_connection
+from utils.insights import record_entry
+
+# Most points sent to the browser for the mood trend chart
+MAX_TREND_POINTS = 500
+# Resampling period for each trend aggregation option
+AGGREGATE_PERIODS = {"daily": "D", "weekly": "W"}
+
+def save_entry(entry, score, filename=None):
+    # Save journal entry with sentiment score and timestamp; an indexed insert, not a file rewrite.
+    # `filename` is accepted for existing callers but unused: the journal lives in the database
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log.append({"entry": entry, "score": score, "timestamp": timestamp})
-    
-    with open(filename, "w") as f:
-        json.dump(log, f)
-    return log
-
-def plot_trends(log):
-    # Plot mood trend over time
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO journal (entry, score, timestamp) VALUES (?, ?, ?)",
+            (entry, score, timestamp),
+        )
+        record_entry(conn, entry, score)
+        _record_rollups(conn, score, timestamp)
+        bump_version(conn, "journal:version")
+    return {"entry": entry, "score": score, "timestamp": timestamp}
+
+def load_journal():
+    # Load every journal entry, oldest first
+    rows = get_connection().execute("SELECT entry, score, timestamp FROM journal ORDER BY id")
+    return [dict(row) for row in rows]
+
+def _week_start(day):
+    # Monday of the week containing `day` ("YYYY-MM-DD")
+    date = datetime.strptime(day, "%Y-%m-%d")
+    return (date - timedelta(days=date.weekday())).strftime("%Y-%m-%d")
+
+def _record_rollups(conn, score, timestamp):
+    # Fold one entry into its day's and week's rollup rows
+    day = timestamp[:10]
+    for table, key_column, key in (("mood_daily", "day", day), ("mood_weekly", "week_start", _week_start(day))):
+        conn.execute(
+            f"INSERT INTO {table} ({key_column}, count, total, min_score, max_score) VALUES (?, 1, ?, ?, ?) "
+            f"ON CONFLICT ({key_column}) DO UPDATE SET count = count + 1, total = total + excluded.total, "
+            "min_score = MIN(min_score, excluded.min_score), max_score = MAX(max_score, excluded.max_score)",
+            (key, score, score, score),
+        )
+
+def rebuild_rollups(conn):
+    """Recomputes the daily and weekly rollups from the whole journal (after imports or re-scoring)."""
+    conn.execute("DELETE FROM mood_daily")
+    conn.execute("DELETE FROM mood_weekly")
+    conn.execute(
+        "INSERT INTO mood_daily (day, count, total, min_score, max_score) "
+        "SELECT substr(timestamp, 1, 10), COUNT(*), SUM(score), MIN(score), MAX(score) "
+        "FROM journal WHERE timestamp IS NOT NULL GROUP BY substr(timestamp, 1, 10)"
+    )
+    # 'weekday 0' moves forward to Sunday, so six days back is that week's Monday
+    conn.execute(
+        "INSERT INTO mood_weekly (week_start, count, total, min_score, max_score) "
+        "SELECT date(day, 'weekday 0', '-6 days') AS week, SUM(count), SUM(total), MIN(min_score), MAX(max_score) "
+        "FROM mood_daily GROUP BY week"
+    )
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollups:built', '1')")
+
+def _rollup_connection():
+    # Rollups are built from the journal the first time they're queried
+    conn = get_connection()
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'rollups:built'").fetchone() is None:
+        with conn:
+            rebuild_rollups(conn)
+    return conn
+
+def _summary(row):
+    if row is None or not row["count"]:
+        return None
+    return {"count": row["count"], "mean": row["total"] / row["count"], "min": row["min_score"], "max": row["max_score"]}
+
+def get_mood_for_day(day):
+    """Returns {count, mean, min, max} for one day ("YYYY-MM-DD"), or None if nothing was written."""
+    return _summary(_rollup_connection().execute("SELECT * FROM mood_daily WHERE day = ?", (day,)).fetchone())
+
+def get_mood_today():
+    """Returns today's mood summary, or None if there's no entry yet today."""
+    return get_mood_for_day(datetime.now().strftime("%Y-%m-%d"))
+
+def get_mood_this_week():
+    """Returns this week's (Monday to Sunday) mood summary, or None."""
+    week_start = _week_start(datetime.now().strftime("%Y-%m-%d"))
+    return _summary(_rollup_connection().execute("SELECT * FROM mood_weekly WHERE week_start = ?", (week_start,)).fetchone())
+
+def get_mood_range(start_day, end_day):
+    """Returns the combined mood summary for the inclusive day range, reading one row per day."""
+    row = _rollup_connection().execute(
+        "SELECT SUM(count) AS count, SUM(total) AS total, MIN(min_score) AS min_score, MAX(max_score) AS max_score "
+        "FROM mood_daily WHERE day BETWEEN ? AND ?",
+        (start_day, end_day),
+    ).fetchone()
+    return _summary(row)
+
+def get_daily_moods(start_day, end_day):
+    """Returns [(day, mean score)] for each day with entries in the inclusive range."""
+    rows = _rollup_connection().execute(
+        "SELECT day, total / count AS mean FROM mood_daily WHERE day BETWEEN ? AND ? ORDER BY day",
+        (start_day, end_day),
+    )
+    return [(row["day"], row["mean"]) for row in rows]
+
+def downsample_lttb(y, max_points):
+    # Largest-Triangle-Three-Buckets: keep the first and last points, and from each
+    # bucket in between the point forming the largest triangle with its neighbours,
+    # so peaks and dips survive. Returns the indices of the kept points.
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float)
+    bucket_size = (n - 2) / (max_points - 2)
+    kept = [0]
+    previous = 0
+    for i in range(max_points - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if end >= n - 1:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        kept.append(previous)
+    kept.append(n - 1)
+    return np.array(kept)
+
+def plot_trends(log, max_points=MAX_TREND_POINTS, aggregate=None, rolling_window=1):
+    """
+    Plot mood trend over time with at most `max_points` points, however long the history.
+    aggregate="daily" or "weekly" plots period means (smoothed over `rolling_window` periods)
+    instead of individual entries.
+    """
     if not log:
         return px.line(title="Mood Trend Over Time (No data yet)")
-        
-    scores = [e["score"] for e in log]
-    timestamps = [e.get("timestamp") for e in log] # Use .get for safety
-    
+
+    import pandas as pd
+
+    frame = pd.DataFrame({
+        "timestamp": pd.to_datetime([e.get("timestamp") for e in log], errors="coerce"), # Use .get for safety
+        "score": [e["score"] for e in log],
+    })
+
+    title = "Mood Trend Over Time"
+    if aggregate:
+        period = AGGREGATE_PERIODS[aggregate]
+        series = frame.dropna(subset=["timestamp"]).set_index("timestamp")["score"].resample(period).mean().dropna()
+        series = series.rolling(rolling_window, min_periods=1).mean()
+        frame = series.reset_index()
+        title = f"Mood Trend Over Time ({aggregate.capitalize()} Average)"
+
+    kept = downsample_lttb(frame["score"].to_numpy(), max_points)
+    frame = frame.iloc[kept]
+
     # Use timestamps for the x-axis
-    fig = px.line(x=timestamps, y=scores, labels={'x': 'Date', 'y':'Mood Score (1-5)'}, title="Mood Trend Over Time")
+    fig = px.line(x=frame["timestamp"], y=frame["score"], labels={'x': 'Date', 'y':'Mood Score (1-5)'}, title=title)
     return fig
\ No newline at end of file
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+# One embedded database holds the journal, daily goals and memory vault
+DB_FILE = os.environ.get("MINDSIGHT_DB", "mindsight.db")
+# JSON files the app used before the database existed; imported once on first start
+JOURNAL_JSON = "journal_log.json"
+GOALS_JSON = "daily_goals.json"
+MEMORIES_JSON = "memory_vault.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY,
+    entry TEXT NOT NULL,
+    score REAL NOT NULL,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS journal_timestamp ON journal (timestamp);
+-- Running per-category mood totals, kept current by save_entry (see utils/insights.py)
+CREATE TABLE IF NOT EXISTS insight_totals (
+    category TEXT PRIMARY KEY,
+    with_count INTEGER NOT NULL DEFAULT 0,
+    with_sum REAL NOT NULL DEFAULT 0,
+    without_count INTEGER NOT NULL DEFAULT 0,
+    without_sum REAL NOT NULL DEFAULT 0
+);
+-- Per-day and per-week mood rollups, kept current by save_entry (see utils/data_storage.py)
+CREATE TABLE IF NOT EXISTS mood_daily (
+    day TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min_score REAL NOT NULL,
+    max_score REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mood_weekly (
+    week_start TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min_score REAL NOT NULL,
+    max_score REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS goals (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    text TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS goals_day ON goals (day);
+-- Per-day goal counts and the streak ending on that day, kept current by utils/goals.py
+CREATE TABLE IF NOT EXISTS goal_days (
+    day TEXT PRIMARY KEY,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    streak INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS goal_days_streak ON goal_days (streak);
+-- Which journal entry or memory each row of the embedding file holds (see utils/semantic_search.py)
+CREATE TABLE IF NOT EXISTS embeddings (
+    position INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    source_id INTEGER NOT NULL,
+    UNIQUE (kind, source_id)
+);
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    hash TEXT NOT NULL UNIQUE,
+    slot INTEGER
+);
+"""
+
+# Streamlit serves each session on its own thread, and sqlite3 connections
+# can't be shared between threads, so every thread gets its own connection
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+
+def content_hash(text):
+    """Returns the hash used to index memories by their text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def bump_version(conn, key):
+    """Increments the change counter stored under `key` in meta, which in-process caches compare against."""
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES (?, '1') "
+        "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+        (key,),
+    )
+
+def get_version(conn, key):
+    """Returns the change counter stored under `key`, or 0 if it was never bumped."""
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return int(row["value"]) if row else 0
+
+def get_connection():
+    """Returns this thread's connection, creating the schema and importing old JSON data on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers keep going while another session writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+
+    with _init_lock:
+        if DB_FILE not in _initialized:
+            conn.executescript(SCHEMA)
+            _migrate(conn)
+            _import_json_files(conn)
+            _number_memory_slots(conn)
+            _initialized.add(DB_FILE)
+    return conn
+
+def _migrate(conn):
+    # Bring databases created by older versions up to the current schema
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(memories)")}
+    if "slot" not in columns:
+        conn.execute("ALTER TABLE memories ADD COLUMN slot INTEGER")
+    # Dense 0..n-1 positions used to pick a random memory (see utils/memory_vault.py)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS memories_slot ON memories (slot)")
+    conn.commit()
+
+def _number_memory_slots(conn):
+    # Give every memory a dense slot, in insertion order, if any are missing one
+    with conn:
+        if conn.execute("SELECT 1 FROM memories WHERE slot IS NULL LIMIT 1").fetchone() is None:
+            return
+        conn.execute("UPDATE memories SET slot = NULL")
+        conn.executemany(
+            "UPDATE memories SET slot = ? WHERE id = ?",
+            enumerate(row["id"] for row in conn.execute("SELECT id FROM memories ORDER BY id").fetchall()),
+        )
+
+def _load_json(filename, default):
+    try:
+        with open(filename, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return default
+
+def _import_json_files(conn):
+    # BEGIN IMMEDIATE takes the write lock up front, so two processes starting
+    # together can't both see the import as pending
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        done = {row["key"] for row in conn.execute("SELECT key FROM meta WHERE key LIKE 'imported:%'")}
+
+        if "imported:journal" not in done:
+            conn.executemany(
+                "INSERT INTO journal (entry, score, timestamp) VALUES (?, ?, ?)",
+                [(e.get("entry", ""), e.get("score", 3), e.get("timestamp")) for e in _load_json(JOURNAL_JSON, [])],
+            )
+        if "imported:goals" not in done:
+            conn.executemany(
+                "INSERT INTO goals (day, text, completed) VALUES (?, ?, ?)",
+                [(day, g["text"], int(g["completed"]))
+                 for day, goals in _load_json(GOALS_JSON, {}).items() for g in goals],
+            )
+        if "imported:memories" not in done:
+            conn.executemany(
+                "INSERT OR IGNORE INTO memories (text, hash) VALUES (?, ?)",
+                [(m, content_hash(m)) for m in _load_json(MEMORIES_JSON, [])],
+            )
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES (?, '1')",
+            [("imported:journal",), ("imported:goals",), ("imported:memories",)],
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
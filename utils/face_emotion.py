@@ -1,14 +1,20 @@
 import cv2
-from fer import FER
 import time
 from collections import Counter
+from utils.model_registry import register_model, get_model
 
-detector = FER(mtcnn=True)
+def _load_face_detector():
+    # Imported here because fer pulls in TensorFlow, which dominates app start-up
+    from fer import FER
+    return FER(mtcnn=True)
+
+register_model("face_emotion", _load_face_detector)
 
 def analyze_video_stream(duration=5):
     """
     Analyzes webcam video for a set duration and finds the dominant emotion.
     """
+    detector = get_model("face_emotion")
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
         return "Error: Could not access webcam.", None
@@ -1,56 +1,141 @@
-import json
-from datetime import datetime
-
-FILENAME = "daily_goals.json"
+from datetime import datetime, timedelta
+from utils.db import get_connection
 
 def get_today_key():
     """Returns the key for today's date, e.g., '2025-09-18'."""
     return datetime.now().strftime("%Y-%m-%d")
 
+def _shift_day(day, days):
+    return (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+def _day_streak(conn, day, done):
+    # A day with at least one completed goal extends the streak of the day before it
+    if not done:
+        return 0
+    previous = conn.execute("SELECT streak FROM goal_days WHERE day = ?", (_shift_day(day, -1),)).fetchone()
+    return (previous["streak"] if previous else 0) + 1
+
+def _refresh_day(conn, day):
+    """
+    Recounts one day's goals and its streak. Goals are almost always edited today, the
+    last day, so nothing else changes; editing an older day walks forward only until
+    the later streaks stop changing.
+    """
+    counts = conn.execute(
+        "SELECT COUNT(*) AS total, COALESCE(SUM(completed), 0) AS completed FROM goals WHERE day = ?", (day,)
+    ).fetchone()
+    streak = _day_streak(conn, day, counts["completed"] > 0)
+    conn.execute(
+        "INSERT OR REPLACE INTO goal_days (day, total, completed, streak) VALUES (?, ?, ?, ?)",
+        (day, counts["total"], counts["completed"], streak),
+    )
+
+    while True:
+        day = _shift_day(day, 1)
+        row = conn.execute("SELECT completed, streak FROM goal_days WHERE day = ?", (day,)).fetchone()
+        if row is None:
+            break
+        new_streak = _day_streak(conn, day, row["completed"] > 0)
+        if new_streak == row["streak"]:
+            break
+        conn.execute("UPDATE goal_days SET streak = ? WHERE day = ?", (new_streak, day))
+
+def rebuild_goal_index(conn):
+    """Recomputes every day's counts and streak from the goals table, oldest day first."""
+    conn.execute("DELETE FROM goal_days")
+    for row in conn.execute("SELECT DISTINCT day FROM goals ORDER BY day").fetchall():
+        _refresh_day(conn, row["day"])
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('goal_index:built', '1')")
+
+def _index_connection():
+    # The index is built from existing goals the first time it's needed
+    conn = get_connection()
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'goal_index:built'").fetchone() is None:
+        with conn:
+            rebuild_goal_index(conn)
+    return conn
+
+def _as_goal(row):
+    return {"id": row["id"], "text": row["text"], "completed": bool(row["completed"])}
+
 def load_goals():
-    """Loads all goals from the JSON file."""
-    try:
-        with open(FILENAME, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+    """Loads all goals, grouped by day. Only needed for exports; pages read a single day."""
+    all_goals = {}
+    for row in get_connection().execute("SELECT id, day, text, completed FROM goals ORDER BY day, id"):
+        all_goals.setdefault(row["day"], []).append(_as_goal(row))
+    return all_goals
 
 def save_goals(goals):
-    """Saves the goals dictionary to the JSON file."""
-    with open(FILENAME, "w") as f:
-        json.dump(goals, f, indent=4)
+    """Replaces every stored goal with the given {day: [goal, ...]} dictionary."""
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM goals")
+        conn.executemany(
+            "INSERT INTO goals (day, text, completed) VALUES (?, ?, ?)",
+            [(day, g["text"], int(g["completed"])) for day, day_goals in goals.items() for g in day_goals],
+        )
+        rebuild_goal_index(conn)
+
+def get_goals_for_day(day):
+    """Gets the goals for one day, each with a stable "id", reading only that day's rows."""
+    rows = get_connection().execute(
+        "SELECT id, text, completed FROM goals WHERE day = ? ORDER BY id", (day,)
+    )
+    return [_as_goal(row) for row in rows]
 
 def get_todays_goals():
     """Gets the list of goals for the current day."""
-    all_goals = load_goals()
-    today_key = get_today_key()
-    return all_goals.get(today_key, [])
+    return get_goals_for_day(get_today_key())
 
 def add_goal(new_goal):
-    """Adds a new goal for today."""
-    all_goals = load_goals()
+    """Adds a new goal for today and returns its id."""
     today_key = get_today_key()
-    
-    if today_key not in all_goals:
-        all_goals[today_key] = []
-        
-    all_goals[today_key].append({"text": new_goal, "completed": False})
-    save_goals(all_goals)
-
-def update_goal_status(goal_index, completed):
-    """Updates the completion status of a specific goal for today."""
-    all_goals = load_goals()
+    conn = _index_connection()
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO goals (day, text, completed) VALUES (?, ?, 0)", (today_key, new_goal)
+        )
+        _refresh_day(conn, today_key)
+    return cursor.lastrowid
+
+def update_goal_status(goal_id, completed):
+    """Updates the completion status of a goal by its id."""
+    conn = _index_connection()
+    with conn:
+        row = conn.execute("SELECT day FROM goals WHERE id = ?", (goal_id,)).fetchone()
+        if row:
+            conn.execute("UPDATE goals SET completed = ? WHERE id = ?", (int(completed), goal_id))
+            _refresh_day(conn, row["day"])
+
+def remove_goal(goal_id):
+    """Removes a goal by its id."""
+    conn = _index_connection()
+    with conn:
+        row = conn.execute("SELECT day FROM goals WHERE id = ?", (goal_id,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM goals WHERE id = ?", (goal_id,))
+            _refresh_day(conn, row["day"])
+
+def get_current_streak():
+    """Days in a row, up to today, with at least one completed goal. Today doesn't break it until it's over."""
+    conn = _index_connection()
     today_key = get_today_key()
-    
-    if today_key in all_goals and 0 <= goal_index < len(all_goals[today_key]):
-        all_goals[today_key][goal_index]["completed"] = completed
-        save_goals(all_goals)
-
-def remove_goal(goal_index):
-    """Removes a specific goal by its index for today."""
-    all_goals = load_goals()
+    for day in (today_key, _shift_day(today_key, -1)):
+        row = conn.execute("SELECT streak FROM goal_days WHERE day = ?", (day,)).fetchone()
+        if row and row["streak"]:
+            return row["streak"]
+    return 0
+
+def get_longest_streak():
+    """The longest run of days with at least one completed goal."""
+    row = _index_connection().execute("SELECT MAX(streak) AS longest FROM goal_days").fetchone()
+    return row["longest"] or 0
+
+def get_completion_rate(days=7):
+    """Share of goals completed over the last `days` days including today, or None if none were set."""
     today_key = get_today_key()
-    
-    if today_key in all_goals and 0 <= goal_index < len(all_goals[today_key]):
-        all_goals[today_key].pop(goal_index)
-        save_goals(all_goals)
\ No newline at end of file
+    row = _index_connection().execute(
+        "SELECT SUM(total) AS total, SUM(completed) AS completed FROM goal_days WHERE day BETWEEN ? AND ?",
+        (_shift_day(today_key, 1 - days), today_key),
+    ).fetchone()
+    return row["completed"] / row["total"] if row["total"] else None
\ No newline at end of file
@@ -1,5 +1,7 @@
 import json
-import re
+import numpy as np
+from utils.db import get_connection, get_version
+from utils.keyword_matcher import scan_text
 
 # Keywords to track for insights
 KEYWORD_CATEGORIES = {
@@ -9,41 +11,149 @@ KEYWORD_CATEGORIES = {
     "Work": ["work", "meeting", "project", "deadline", "office"]
 }
 
-def analyze_journal_insights(filename="journal_log.json"):
+# Stored next to the totals so editing the keyword lists triggers a rebuild
+_TOTALS_VERSION = json.dumps(KEYWORD_CATEGORIES, sort_keys=True)
+
+def _matching_categories(text):
+    """Returns the categories with at least one keyword in the text."""
+    return scan_text(text) & KEYWORD_CATEGORIES.keys()
+
+def record_entry(conn, entry, score):
     """
-    Analyzes the journal log to find correlations between keywords and mood scores.
+    Adds one new journal entry to the running per-category totals.
+    Called by save_entry inside its transaction, so totals and log never disagree.
+    """
+    matched = _matching_categories(entry)
+    conn.executemany(
+        "UPDATE insight_totals SET with_count = with_count + ?, with_sum = with_sum + ?, "
+        "without_count = without_count + ?, without_sum = without_sum + ? WHERE category = ?",
+        [
+            (1, score, 0, 0, category) if category in matched else (0, 0, 1, score, category)
+            for category in KEYWORD_CATEGORIES
+        ],
+    )
+
+def rebuild_totals(conn):
+    """Recomputes the per-category totals from the whole journal (after imports, re-scoring or keyword changes)."""
+    totals = {category: [0, 0.0, 0, 0.0] for category in KEYWORD_CATEGORIES}
+    for row in conn.execute("SELECT entry, score FROM journal"):
+        matched = _matching_categories(row["entry"])
+        for category, counts in totals.items():
+            offset = 0 if category in matched else 2
+            counts[offset] += 1
+            counts[offset + 1] += row["score"]
+
+    conn.execute("DELETE FROM insight_totals")
+    conn.executemany(
+        "INSERT INTO insight_totals (category, with_count, with_sum, without_count, without_sum) VALUES (?, ?, ?, ?, ?)",
+        [(category, *counts) for category, counts in totals.items()],
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES ('insights:version', ?)", (_TOTALS_VERSION,)
+    )
+
+def _load_totals():
+    conn = get_connection()
+    with conn:
+        version = conn.execute("SELECT value FROM meta WHERE key = 'insights:version'").fetchone()
+        if version is None or version["value"] != _TOTALS_VERSION:
+            rebuild_totals(conn)
+        return {row["category"]: row for row in conn.execute("SELECT * FROM insight_totals")}
+
+def _summarize(categories, with_count, with_sum, without_count, without_sum):
+    # Vectorized per-category averages and lift from count/sum arrays
+    with_count = np.asarray(with_count, dtype=float)
+    without_count = np.asarray(without_count, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_with = np.asarray(with_sum, dtype=float) / with_count
+        avg_without = np.where(without_count > 0, np.asarray(without_sum, dtype=float) / without_count, avg_with)
+        lift = avg_with / avg_without - 1
+
+    return {
+        category: {
+            "mentions": int(with_count[i]),
+            "entries": int(with_count[i] + without_count[i]),
+            "avg_with": float(avg_with[i]) if with_count[i] else None,
+            "avg_without": float(avg_without[i]) if with_count[i] else None,
+            "lift": float(lift[i]) if with_count[i] else None,
+        }
+        for i, category in enumerate(categories)
+    }
+
+def get_insight_stats():
+    """
+    Returns per-category numbers for the whole journal, read from the running totals:
+    {category: {"mentions", "entries", "avg_with", "avg_without", "lift"}}.
+    """
+    totals = _load_totals()
+    categories = [category for category in KEYWORD_CATEGORIES if category in totals]
+    rows = [totals[category] for category in categories]
+    return _summarize(
+        categories,
+        [row["with_count"] for row in rows],
+        [row["with_sum"] for row in rows],
+        [row["without_count"] for row in rows],
+        [row["without_sum"] for row in rows],
+    )
+
+_frame_cache = {}
+
+def load_journal_frame():
+    """
+    Loads the journal into a columnar DataFrame: score, timestamp and one boolean
+    column per category. Cached until the journal's version counter in meta changes
+    (bumped by every save and re-score).
     """
-    try:
-        with open(filename, "r") as f:
-            log = json.load(f)
-    except FileNotFoundError:
-        return {"error": "No journal entries found yet."}
+    import pandas as pd
+
+    conn = get_connection()
+    version = get_version(conn, "journal:version")
+    if "frame" in _frame_cache and _frame_cache["version"] == version:
+        return _frame_cache["frame"]
+
+    rows = conn.execute("SELECT entry, score, timestamp FROM journal ORDER BY id").fetchall()
+    matches = [scan_text(row["entry"]) for row in rows]
+    frame = pd.DataFrame({
+        "score": np.fromiter((row["score"] for row in rows), dtype=float, count=len(rows)),
+        "timestamp": pd.to_datetime([row["timestamp"] for row in rows], errors="coerce"),
+    })
+    for category in KEYWORD_CATEGORIES:
+        frame[category] = np.fromiter((category in m for m in matches), dtype=bool, count=len(rows))
 
-    if not log:
+    _frame_cache.update(version=version, frame=frame)
+    return frame
+
+def insight_stats(frame):
+    """
+    Computes the same per-category numbers as get_insight_stats with array operations
+    over a journal frame, which can first be filtered, e.g. to a date range.
+    """
+    categories = list(KEYWORD_CATEGORIES)
+    scores = frame["score"].to_numpy(dtype=float)
+    masks = frame[categories].to_numpy(dtype=bool)
+
+    with_count = masks.sum(axis=0)
+    with_sum = scores @ masks
+    return _summarize(categories, with_count, with_sum, len(scores) - with_count, scores.sum() - with_sum)
+
+def analyze_journal_insights(filename=None):
+    """
+    Analyzes the journal log to find correlations between keywords and mood scores.
+    Reads the running totals, so the cost depends on the number of categories, not entries.
+    `filename` is accepted for existing callers but unused: the journal lives in the database.
+    """
+    stats = get_insight_stats()
+    if not any(numbers["entries"] for numbers in stats.values()):
         return {"error": "Not enough data to generate insights."}
 
     insights = {}
-    for category, keywords in KEYWORD_CATEGORIES.items():
-        mood_with_keyword = []
-        mood_without_keyword = []
-        
-        for entry in log:
-            text = entry.get("entry", "").lower()
-            score = entry.get("score", 3)
-            
-            # Check if any keyword in the category is present
-            if any(re.search(r'\b' + keyword + r'\b', text) for keyword in keywords):
-                mood_with_keyword.append(score)
-            else:
-                mood_without_keyword.append(score)
-        
-        if mood_with_keyword:
-            avg_with = sum(mood_with_keyword) / len(mood_with_keyword)
-            avg_without = sum(mood_without_keyword) / len(mood_without_keyword) if mood_without_keyword else avg_with
+    for category, numbers in stats.items():
+        if numbers["mentions"]:
+            avg_with, avg_without = numbers["avg_with"], numbers["avg_without"]
             
             if avg_with > avg_without * 1.1: # At least 10% higher
-                insights[category] = f"Your mood is, on average, **{int(((avg_with / avg_without) - 1) * 100)}% higher** on days you mention **{category.lower()}** activities. (Avg score: {avg_with:.2f})"
+                insights[category] = f"Your mood is, on average, **{int(numbers['lift'] * 100)}% higher** on days you mention **{category.lower()}** activities. (Avg score: {avg_with:.2f})"
             elif avg_with < avg_without * 0.9: # At least 10% lower
-                insights[category] = f"Your mood is, on average, **{int((1 - (avg_with / avg_without)) * 100)}% lower** on days you mention **{category.lower()}**. (Avg score: {avg_with:.2f})"
+                insights[category] = f"Your mood is, on average, **{int(-numbers['lift'] * 100)}% lower** on days you mention **{category.lower()}**. (Avg score: {avg_with:.2f})"
 
     return insights if insights else {"message": "No strong correlations found yet. Keep journaling to discover more about your patterns!"}
\ No newline at end of file
@@ -0,0 +1,136 @@
+import argparse
+import re
+import time
+
+# Group name under which crisis keywords are reported by scan_text
+CRISIS_GROUP = "Crisis"
+# Group for phrases that need the crisis classifier to decide
+BORDERLINE_GROUP = "Borderline"
+
+_WORD = re.compile(r"\w+")
+
+class KeywordMatcher:
+    """
+    Finds every keyword group mentioned in a text in one scan of its words.
+    A single-word keyword matches on word boundaries exactly when it equals one of
+    the text's \\w+ tokens, so those become set lookups. Phrases and substring
+    keywords get one precompiled alternation per group, so a match for one group
+    can never hide an overlapping match for another (e.g. "give upanic").
+    """
+
+    def __init__(self, word_groups=None, substring_groups=None):
+        # word_groups match whole words only; substring_groups match anywhere in the text
+        self._word_groups = {}
+        patterns = {}
+        for groups, whole_word in ((word_groups or {}, True), (substring_groups or {}, False)):
+            for group, keywords in groups.items():
+                for keyword in keywords:
+                    keyword = keyword.lower()
+                    if whole_word and _WORD.fullmatch(keyword):
+                        self._word_groups.setdefault(keyword, set()).add(group)
+                        continue
+                    pattern = r"\b" + re.escape(keyword) + r"\b" if whole_word else re.escape(keyword)
+                    patterns.setdefault(group, []).append(pattern)
+
+        # Non-capturing, so the regex engine can prefilter on first characters;
+        # a group only needs its first hit, so a search stops there
+        self._group_regexes = {group: re.compile("|".join(alternatives)) for group, alternatives in patterns.items()}
+
+    def find(self, text):
+        """Returns the set of groups with at least one keyword in the text."""
+        text = text.lower()
+        found = set()
+        for word in self._word_groups.keys() & _WORD.findall(text):
+            found |= self._word_groups[word]
+        for group, regex in self._group_regexes.items():
+            if group not in found and regex.search(text):
+                found.add(group)
+        return found
+
+_shared_matcher = None
+
+def get_shared_matcher():
+    """Returns the matcher covering insight categories, crisis and borderline keywords."""
+    global _shared_matcher
+    if _shared_matcher is None:
+        # Imported here because both modules import this one
+        from utils.crisis_detection import BORDERLINE_KEYWORDS, CRISIS_KEYWORDS
+        from utils.insights import KEYWORD_CATEGORIES
+        _shared_matcher = KeywordMatcher(
+            word_groups=KEYWORD_CATEGORIES,
+            substring_groups={CRISIS_GROUP: CRISIS_KEYWORDS, BORDERLINE_GROUP: BORDERLINE_KEYWORDS},
+        )
+    return _shared_matcher
+
+def scan_text(text):
+    """Returns every insight category, CRISIS_GROUP and BORDERLINE_GROUP hit in the text, in a single pass."""
+    return get_shared_matcher().find(text)
+
+def _scan_per_keyword(text):
+    # The matching this module replaced: one regex search per keyword plus substring loops
+    from utils.crisis_detection import BORDERLINE_KEYWORDS, CRISIS_KEYWORDS
+    from utils.insights import KEYWORD_CATEGORIES
+
+    text = text.lower()
+    found = {
+        category for category, keywords in KEYWORD_CATEGORIES.items()
+        if any(re.search(r'\b' + keyword + r'\b', text) for keyword in keywords)
+    }
+    if any(word in text for word in CRISIS_KEYWORDS):
+        found.add(CRISIS_GROUP)
+    if any(phrase in text for phrase in BORDERLINE_KEYWORDS):
+        found.add(BORDERLINE_GROUP)
+    return found
+
+# Texts where keywords of different groups overlap or touch, which a single shared
+# alternation would resolve to only one group; always part of the benchmark's check
+OVERLAP_CASES = [
+    "give upanic",
+    "i want to give up, panic everywhere",
+    "feeling hopelessly alone at work",
+    "no pointless meetings, just a walk with friends",
+    "i feel like a burdenpressed and depressed",
+]
+
+def benchmark(texts):
+    """
+    Times the per-keyword loop against the shared matcher over `texts` and checks
+    they agree, on `texts` and on OVERLAP_CASES.
+    """
+    start_time = time.perf_counter()
+    expected = [_scan_per_keyword(text) for text in texts]
+    per_keyword_seconds = time.perf_counter() - start_time
+
+    matcher = get_shared_matcher()
+    start_time = time.perf_counter()
+    actual = [matcher.find(text) for text in texts]
+    matcher_seconds = time.perf_counter() - start_time
+
+    return {
+        "entries": len(texts),
+        "per_keyword_seconds": per_keyword_seconds,
+        "matcher_seconds": matcher_seconds,
+        "speedup": per_keyword_seconds / matcher_seconds if matcher_seconds else float("inf"),
+        "mismatches": sum(a != e for a, e in zip(actual, expected))
+        + sum(matcher.find(text) != _scan_per_keyword(text) for text in OVERLAP_CASES),
+    }
+
+if __name__ == "__main__":
+    from utils.db import get_connection
+
+    parser = argparse.ArgumentParser(description="Benchmark keyword matching on a large synthetic journal.")
+    parser.add_argument("--entries", type=int, default=50000)
+    args = parser.parse_args()
+
+    # Repeat the journal's own entries (or a stock sentence) up to the requested size
+    seeds = [row["entry"] for row in get_connection().execute("SELECT entry FROM journal")] or [
+        "Had a long meeting at work, then went for a walk with a friend and slept early."
+    ]
+    texts = [seeds[i % len(seeds)] for i in range(args.entries)]
+
+    result = benchmark(texts)
+    print(
+        f"{result['entries']} entries: per-keyword {result['per_keyword_seconds']:.3f}s, "
+        f"matcher {result['matcher_seconds']:.3f}s ({result['speedup']:.1f}x), "
+        f"{result['mismatches']} mismatches"
+    )
@@ -2,8 +2,14 @@
 # import google.generativeai as genai
 
 # genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+import functools
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st # Import Streamlit
 import google.generativeai as genai
+from utils.cache import LRUCache, content_key
+from utils.llm_client import LLMError, RetryPolicy, chat_turns, is_transient_gemini_error, to_api_history
 
 # This line reads from Streamlit's secure Secrets manager
 genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
@@ -19,34 +25,194 @@ Your goal is to listen, provide a safe space for reflection, and offer gentle en
 - Keep your responses thoughtful but not excessively long.
 """
 
+MODEL_NAME = "gemini-1.5-flash"
+# Where each Streamlit session keeps its live chat between turns
+_CHAT_STATE_KEY = "_mindsight_chat"
+# Where each Streamlit session keeps the rolling summary of its folded-away turns
+_SUMMARY_STATE_KEY = "_mindsight_summary"
+
+# Replies to identical conversations (e.g. the opener for the same insight, or a retried
+# message) are reused for up to RESPONSE_CACHE_TTL seconds; kept in memory only
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = 60 * 60
+response_cache = LRUCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+
+# Estimated tokens of verbatim history sent per turn before older turns are summarized
+HISTORY_TOKEN_BUDGET = 2000
+# Most recent messages that are always sent word for word
+KEEP_RECENT_MESSAGES = 6
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a user and MindSight, a supportive
+wellness companion. Update the existing summary with the new messages. Keep what matters for
+continuing the conversation kindly: the user's feelings, situations, people and goals they
+mentioned, and anything they asked to be remembered. Write at most 150 words, in third person.
+"""
+
+@functools.lru_cache(maxsize=16)
+def get_chat_model(system_instruction):
+    """Returns a model for this system prompt, built once and reused across turns and sessions."""
+    return genai.GenerativeModel(model_name=MODEL_NAME, system_instruction=system_instruction)
+
+def _response_key(conversation_history):
+    # Whitespace differences don't change the conversation, so they don't change the key
+    system_instruction = " ".join(conversation_history[0]["content"].split())
+    turns = [[msg["role"], " ".join(msg["content"].split())] for msg in chat_turns(conversation_history)]
+    return content_key(MODEL_NAME, system_instruction, json.dumps(turns))
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token), cheap enough to run every turn."""
+    return len(text) // 4 + 1
+
+def _summarize(previous_summary, messages):
+    # Fold older messages into the running summary with a separate, cached summarizer model
+    transcript = "\n".join(
+        f"{'User' if msg['role'] == 'user' else 'MindSight'}: {msg['content']}" for msg in messages
+    )
+    prompt = f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+    return get_chat_model(SUMMARY_PROMPT).generate_content(prompt).text.strip()
+
+# Summaries are written off the reply path, one at a time for the whole process
+_summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+
+def _summary_state(system_instruction, turns):
+    state = st.session_state.get(_SUMMARY_STATE_KEY)
+    # A new system prompt or a shorter history means a new conversation
+    if not state or state["base"] != system_instruction or state["covered"] > len(turns):
+        state = {"base": system_instruction, "summary": "", "covered": 0, "pending": None}
+        st.session_state[_SUMMARY_STATE_KEY] = state
+    return state
+
+def _fit_history(system_instruction, turns):
+    """
+    Keeps per-turn prompt size flat: turns folded into the rolling summary (see
+    _fold_history) ride along in the system instruction instead of being sent verbatim.
+    Never waits for a summary still being written. Returns (system instruction, verbatim turns).
+    """
+    state = _summary_state(system_instruction, turns)
+    if state["pending"] and state["pending"][0].done():
+        future, fold_until = state["pending"]
+        state["pending"] = None
+        try:
+            state.update(summary=future.result(), covered=fold_until)
+        except Exception:
+            # Without a summary, keep sending the longer history; the next reply tries again
+            pass
+
+    if state["summary"]:
+        system_instruction += f"\n\nSUMMARY OF THE EARLIER CONVERSATION:\n{state['summary']}"
+    return system_instruction, turns[state["covered"]:]
+
+def _fold_history(conversation_history, reply):
+    """
+    Called once a reply is complete: if the verbatim history (with the reply) is over
+    HISTORY_TOKEN_BUDGET, starts folding everything but the last KEEP_RECENT_MESSAGES into
+    the rolling summary in the background. The new summary is used from the next turn it's ready.
+    """
+    turns = chat_turns(conversation_history) + [{"role": "assistant", "content": reply}]
+    state = _summary_state(conversation_history[0]["content"], turns)
+    if state["pending"]:
+        return
+
+    recent = turns[state["covered"]:]
+    over_budget = sum(estimate_tokens(msg["content"]) for msg in recent) > HISTORY_TOKEN_BUDGET
+    if over_budget and len(recent) > KEEP_RECENT_MESSAGES:
+        fold_until = len(turns) - KEEP_RECENT_MESSAGES
+        future = _summarizer.submit(_summarize, state["summary"], turns[state["covered"]:fold_until])
+        state["pending"] = (future, fold_until)
+
+def _start_chat(conversation_history, reuse_live=True):
+    """
+    Returns the chat session for this conversation and the last user message, which hasn't been sent yet.
+    The session's live chat is reused when it already holds everything before that message;
+    otherwise (first turn, new system prompt, edited history, a retry) a chat is rebuilt from the history.
+    """
+    turns = chat_turns(conversation_history)
+    # The system prompt is the first message in the history
+    system_instruction, recent_turns = _fit_history(conversation_history[0]['content'], turns)
+
+    live = st.session_state.get(_CHAT_STATE_KEY)
+    if reuse_live and live and live["system_instruction"] == system_instruction and live["turns"] == len(turns) - 1:
+        chat = live["chat"]
+    else:
+        # Older turns travel in the summary; only the recent ones are sent as chat history
+        chat = get_chat_model(system_instruction).start_chat(history=to_api_history(recent_turns[:-1]))
+
+    # Until the reply completes the live chat can't be trusted, so drop it for now
+    st.session_state[_CHAT_STATE_KEY] = None
+    return chat, turns[-1]["content"], system_instruction, len(turns)
+
+def _keep_chat(chat, system_instruction, turns):
+    # The chat now also holds the reply, which the caller appends as the next message
+    st.session_state[_CHAT_STATE_KEY] = {
+        "chat": chat, "system_instruction": system_instruction, "turns": turns + 1
+    }
+
+# Same timeout and retry policy as the async client in utils/llm_client.py
+retry_policy = RetryPolicy()
+
+def _send(conversation_history, stream=False):
+    """
+    Sends the newest user message under retry_policy: each attempt has a timeout, and
+    transient errors are retried with backoff on a freshly built chat, since a failed
+    send can leave the old one mid-turn. A stream is retried until its first chunk arrives.
+    Returns (chat, system instruction, turns, response).
+    """
+    attempts = itertools.count()
+
+    def attempt(timeout):
+        chat, last_user_message, system_instruction, turns = _start_chat(
+            conversation_history, reuse_live=next(attempts) == 0
+        )
+        response = chat.send_message(last_user_message, stream=stream, request_options={"timeout": timeout})
+        if stream:
+            chunks = iter(response)
+            first = next(chunks, None)
+            response = itertools.chain([] if first is None else [first], chunks)
+        return chat, system_instruction, turns, response
+
+    try:
+        return retry_policy.call(attempt, is_transient_gemini_error)
+    except Exception as e:
+        raise LLMError(f"Sorry, I'm having trouble connecting. Error: {e}") from e
+
 def get_ai_response(conversation_history):
     """
-    Initializes the model with the conversation history (which includes the proactive insight) 
-    and gets the next response.
+    Sends the newest user message in this session's chat (which includes the proactive insight)
+    and gets the next response. Raises LLMError if Gemini can't answer, even after retries.
     """
+    key = _response_key(conversation_history)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+    chat, system_instruction, turns, response = _send(conversation_history)
+    _keep_chat(chat, system_instruction, turns)
+    
+    response_cache.put(key, response.text)
+    _fold_history(conversation_history, response.text)
+    return response.text
+
+def stream_ai_response(conversation_history):
+    """
+    Like get_ai_response, but yields the reply in chunks as Gemini generates them,
+    so the first words can be shown while the rest is still being written.
+    """
+    key = _response_key(conversation_history)
+    cached = response_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    chat, system_instruction, turns, response = _send(conversation_history, stream=True)
+    chunks = []
     try:
-        # The system prompt is the first message in the history
-        system_instruction = conversation_history[0]['content']
-        
-        # The actual chat history starts from the second message
-        history_for_api = [
-            {"role": "user" if msg["role"] == "user" else "model", "parts": [msg["content"]]}
-            for msg in conversation_history if msg["role"] in ["user", "assistant"]
-        ]
-        
-        # Initialize the model with the potentially updated system prompt
-        model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash",
-            system_instruction=system_instruction
-        )
-        
-        # Pop the last user message to send it
-        last_user_message = history_for_api.pop()['parts'][0]
-        
-        # Start the chat with the preceding history
-        chat = model.start_chat(history=history_for_api)
-        response = chat.send_message(last_user_message)
-        
-        return response.text
+        for chunk in response:
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
     except Exception as e:
-        return f"Sorry, I'm having trouble connecting. Error: {e}"
\ No newline at end of file
+        # Part of the reply is already on screen, so this can't be retried
+        raise LLMError(f"Sorry, the reply was cut off. Error: {e}") from e
+    # Only a fully received reply is recorded in the chat's history and the cache
+    _keep_chat(chat, system_instruction, turns)
+    response_cache.put(key, "".join(chunks))
+    _fold_history(conversation_history, "".join(chunks))
\ No newline at end of file
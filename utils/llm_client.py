@@ -0,0 +1,226 @@
+import abc
+import argparse
+import asyncio
+import random
+import time
+
+# Requests in flight at once per client, before further calls wait their turn
+MAX_CONCURRENCY = 4
+# Seconds one attempt may take before it's abandoned (and retried)
+REQUEST_TIMEOUT = 30.0
+# Extra attempts after a transient failure, with jittered exponential backoff between them
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+def chat_turns(conversation_history):
+    """Returns the user and assistant turns of a conversation, without the system prompt."""
+    return [msg for msg in conversation_history if msg["role"] in ["user", "assistant"]]
+
+def to_api_history(turns):
+    """Converts turns to the chat history format Gemini's start_chat expects."""
+    return [
+        {"role": "user" if msg["role"] == "user" else "model", "parts": [msg["content"]]}
+        for msg in turns
+    ]
+
+class LLMError(Exception):
+    """Raised when no reply could be produced, after any retries."""
+
+def is_transient_gemini_error(error):
+    """Whether retrying the same Gemini request might succeed."""
+    from google.api_core import exceptions
+
+    # Rate limits, overload and server-side hiccups; bad requests and auth errors are final
+    transient = (
+        exceptions.TooManyRequests, exceptions.ResourceExhausted, exceptions.ServiceUnavailable,
+        exceptions.DeadlineExceeded, exceptions.InternalServerError,
+    )
+    return isinstance(error, (*transient, ConnectionError, TimeoutError))
+
+class RetryPolicy:
+    """
+    A timeout per attempt and full-jitter exponential backoff between attempts on
+    transient errors. Used by LLMClient and by the AI Companion's chat (utils/llm_api.py).
+    """
+
+    def __init__(self, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, attempt):
+        # Full jitter keeps clients that failed together from retrying together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, attempt_fn, is_transient):
+        """
+        Runs attempt_fn(timeout) on this thread until it succeeds, fails with an error
+        is_transient rejects, or the retries run out; the last error is raised.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return attempt_fn(self.timeout)
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                time.sleep(self.backoff(attempt))
+
+class Provider(abc.ABC):
+    """
+    Something that can answer a conversation. The history uses the AI Companion's format:
+    the system prompt first, then {"role": "user" | "assistant", "content": ...} turns,
+    ending with the user message to answer.
+    """
+
+    name = "provider"
+
+    @abc.abstractmethod
+    async def complete(self, conversation_history):
+        """Returns the reply text for the last user message."""
+
+    def is_transient(self, error):
+        """Whether retrying the same request might succeed."""
+        return isinstance(error, (ConnectionError, asyncio.TimeoutError))
+
+class GeminiProvider(Provider):
+    """
+    Calls Gemini through google.generativeai's async API. `model_factory` returns the model
+    for a system instruction, e.g. utils.llm_api.get_chat_model to share the AI Companion's.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model_factory):
+        self._model_factory = model_factory
+
+    async def complete(self, conversation_history):
+        turns = chat_turns(conversation_history)
+        model = self._model_factory(conversation_history[0]["content"])
+        chat = model.start_chat(history=to_api_history(turns[:-1]))
+        response = await chat.send_message_async(turns[-1]["content"])
+        return response.text
+
+    def is_transient(self, error):
+        return is_transient_gemini_error(error) or super().is_transient(error)
+
+class FakeProvider(Provider):
+    """
+    Local stand-in for load-testing the chat path offline. Each reply takes `latency`
+    seconds to start plus one second per `tokens_per_second` words, and fails with a
+    ConnectionError with probability `failure_rate`.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=0.3, tokens_per_second=50.0, reply_tokens=60, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    async def complete(self, conversation_history):
+        await asyncio.sleep(self.latency)
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError("Simulated provider failure")
+        await asyncio.sleep(self.reply_tokens / self.tokens_per_second)
+        return " ".join(["thanks"] * self.reply_tokens)
+
+class LLMClient:
+    """
+    Async front end for a Provider: at most `max_concurrency` requests in flight, and the
+    RetryPolicy's timeout per attempt and jittered backoff between retries of transient
+    errors. Errors that remain are raised to the caller rather than turned into text.
+    A client belongs to the event loop it's first used on.
+    """
+
+    def __init__(self, provider, max_concurrency=MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.provider = provider
+        self.policy = RetryPolicy(timeout, max_retries, backoff_base, backoff_max)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._stats = {"requests": 0, "attempts": 0, "retries": 0, "timeouts": 0, "failures": 0}
+
+    async def complete(self, conversation_history):
+        """Returns the reply to the conversation's last user message."""
+        self._stats["requests"] += 1
+        for attempt in range(self.policy.max_retries + 1):
+            try:
+                # The slot is held for one attempt only, so backing off doesn't block other requests
+                async with self._semaphore:
+                    self._stats["attempts"] += 1
+                    return await asyncio.wait_for(self.provider.complete(conversation_history), self.policy.timeout)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self._stats["timeouts"] += 1
+                if attempt == self.policy.max_retries or not self.provider.is_transient(e):
+                    self._stats["failures"] += 1
+                    raise
+                self._stats["retries"] += 1
+                await asyncio.sleep(self.policy.backoff(attempt))
+
+    async def complete_many(self, histories):
+        """Answers several conversations concurrently; failed ones come back as their exception."""
+        return await asyncio.gather(*(self.complete(history) for history in histories), return_exceptions=True)
+
+    def stats(self):
+        """Returns request, attempt, retry, timeout and failure counts so far."""
+        return dict(self._stats)
+
+async def load_test(client, requests):
+    """Sends `requests` one-message conversations through the client at once and reports latency and throughput."""
+    history = [
+        {"role": "system", "content": "You are MindSight, a caring and supportive AI wellness companion."},
+        {"role": "user", "content": "I had a long day and I'm feeling a bit drained."},
+    ]
+    latencies = []
+
+    async def timed():
+        start_time = time.perf_counter()
+        try:
+            await client.complete(history)
+        finally:
+            latencies.append(time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    results = await asyncio.gather(*(timed() for _ in range(requests)), return_exceptions=True)
+    elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "succeeded": sum(not isinstance(result, Exception) for result in results),
+        "seconds": elapsed,
+        "throughput": requests / elapsed if elapsed else float("inf"),
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        **client.stats(),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the async LLM client against the local fake provider.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT)
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the fake reply starts")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    provider = FakeProvider(latency=args.latency, tokens_per_second=args.tokens_per_second, failure_rate=args.failure_rate)
+
+    async def main():
+        # Created inside the loop that will use it
+        client = LLMClient(provider, max_concurrency=args.concurrency, timeout=args.timeout, max_retries=args.retries)
+        return await load_test(client, args.requests)
+
+    result = asyncio.run(main())
+    print(
+        f"{result['succeeded']}/{result['requests']} succeeded in {result['seconds']:.2f}s "
+        f"({result['throughput']:.1f} req/s), p50 {result['p50']:.2f}s, p95 {result['p95']:.2f}s, "
+        f"{result['retries']} retries, {result['timeouts']} timeouts, {result['failures']} failures"
+    )
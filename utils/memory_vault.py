@@ -1,38 +1,64 @@
-import json
 import random
+from utils.db import content_hash, get_connection
+from utils.semantic_search import forget
 
-FILENAME = "memory_vault.json"
+# Memories are indexed two ways: by content hash, for O(1) dedupe and removal, and by
+# a dense slot number 0..n-1, so a random memory is one indexed lookup of a random slot.
 
 def load_memories():
-    """Loads all memories from the JSON file."""
-    try:
-        with open(FILENAME, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
+    """Loads all memories, oldest first."""
+    return [row["text"] for row in get_connection().execute("SELECT text FROM memories ORDER BY id")]
+
+def count_memories():
+    """Returns how many memories are saved, read from the slot index."""
+    return get_connection().execute("SELECT COALESCE(MAX(slot), -1) + 1 FROM memories").fetchone()[0]
 
 def save_memories(memories):
-    """Saves the list of memories to the JSON file."""
-    with open(FILENAME, "w") as f:
-        json.dump(memories, f, indent=4)
+    """Replaces the vault with the given list of memories."""
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM memories")
+        forget(conn, "memory")
+        unique = list(dict.fromkeys(memories))
+        conn.executemany(
+            "INSERT INTO memories (text, hash, slot) VALUES (?, ?, ?)",
+            [(m, content_hash(m), slot) for slot, m in enumerate(unique)],
+        )
 
 def add_memory(new_memory):
     """Adds a new memory to the vault."""
-    memories = load_memories()
-    if new_memory not in memories: # Avoid duplicate entries
-        memories.append(new_memory)
-        save_memories(memories)
+    conn = get_connection()
+    with conn:
+        # The unique hash index avoids duplicate entries without scanning the vault,
+        # and the next slot comes from the slot index in the same statement
+        conn.execute(
+            "INSERT OR IGNORE INTO memories (text, hash, slot) "
+            "SELECT ?, ?, COALESCE(MAX(slot), -1) + 1 FROM memories",
+            (new_memory, content_hash(new_memory)),
+        )
 
 def get_random_memory():
     """Returns a random memory from the vault."""
-    memories = load_memories()
-    if memories:
-        return random.choice(memories)
-    return None
+    conn = get_connection()
+    row = conn.execute("SELECT MAX(slot) AS last FROM memories").fetchone()
+    if row["last"] is None:
+        return None
+    row = conn.execute("SELECT text FROM memories WHERE slot = ?", (random.randint(0, row["last"]),)).fetchone()
+    return row["text"] if row else None
 
 def remove_memory(memory_to_remove):
     """Removes a specific memory by its text content."""
-    memories = load_memories()
-    if memory_to_remove in memories:
-        memories.remove(memory_to_remove)
-        save_memories(memories)
\ No newline at end of file
+    conn = get_connection()
+    with conn:
+        # Take the write lock first so no other session moves slots in between
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT id, slot FROM memories WHERE hash = ?", (content_hash(memory_to_remove),)).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM memories WHERE id = ?", (row["id"],))
+        forget(conn, "memory", [row["id"]])
+        # Move the last slot into the gap so slots stay dense
+        conn.execute(
+            "UPDATE memories SET slot = ? WHERE slot = (SELECT MAX(slot) FROM memories) AND slot > ?",
+            (row["slot"], row["slot"]),
+        )
\ No newline at end of file
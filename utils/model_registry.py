@@ -0,0 +1,54 @@
+import threading
+import time
+
+# Loader functions registered by each feature module, keyed by model name
+_LOADERS = {}
+# Loaded model instances, shared by every Streamlit session in this process
+_MODELS = {}
+# Seconds spent loading each model, for the cold start report
+_LOAD_TIMES = {}
+
+# One lock per model, so loading one model never holds up callers of another;
+# _lock only guards creating those locks and is never held during a load
+_lock = threading.Lock()
+_model_locks = {}
+
+def _model_lock(name):
+    with _lock:
+        return _model_locks.setdefault(name, threading.Lock())
+
+def register_model(name, loader):
+    """Registers a zero-argument loader that builds the model called `name`."""
+    _LOADERS[name] = loader
+
+def get_model(name):
+    """
+    Returns the shared instance of a registered model, loading it on first use.
+    Concurrent callers of the same model wait for a single load instead of building their own copy.
+    """
+    model = _MODELS.get(name)
+    if model is not None:
+        return model
+    if name not in _LOADERS:
+        raise KeyError(f"No model registered under '{name}'.")
+
+    with _model_lock(name):
+        if name not in _MODELS:
+            start_time = time.perf_counter()
+            _MODELS[name] = _LOADERS[name]()
+            _LOAD_TIMES[name] = time.perf_counter() - start_time
+    return _MODELS[name]
+
+def is_loaded(name):
+    """Returns True if the model has already been loaded in this process."""
+    return name in _MODELS
+
+def get_load_times():
+    """Returns a copy of the {model name: load seconds} report."""
+    return dict(_LOAD_TIMES)
+
+def unload_model(name):
+    """Drops a loaded model so the next get_model call reloads it."""
+    with _model_lock(name):
+        _MODELS.pop(name, None)
+        _LOAD_TIMES.pop(name, None)
@@ -0,0 +1,179 @@
+import os
+import threading
+import numpy as np
+from utils.db import DB_FILE, bump_version, get_connection, get_version
+from utils.model_registry import register_model, get_model
+
+# Small CPU-friendly sentence embedding model
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+# Raw float32 vectors, one row per embeddings table position, read through np.memmap
+VECTORS_FILE = os.path.splitext(DB_FILE)[0] + ".vectors.f32"
+EMBEDDING_BATCH_SIZE = 32
+# Cosine similarity below which a memory isn't considered related at all
+MIN_RELEVANCE = 0.25
+
+# Where the text for each kind of indexed item lives
+SOURCES = {
+    "memory": ("memories", "text"),
+    "journal": ("journal", "entry"),
+}
+
+def _load_embedder():
+    from transformers import AutoModel, AutoTokenizer
+    return AutoTokenizer.from_pretrained(EMBEDDING_MODEL), AutoModel.from_pretrained(EMBEDDING_MODEL).eval()
+
+register_model("sentence_embedder", _load_embedder)
+
+def embed_texts(texts):
+    """Returns unit-length float32 embeddings, one row per text."""
+    import torch
+
+    tokenizer, model = get_model("sentence_embedder")
+    vectors = [np.zeros((0, EMBEDDING_DIM), dtype=np.float32)]
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        inputs = tokenizer(
+            texts[start:start + EMBEDDING_BATCH_SIZE], padding=True, truncation=True,
+            max_length=256, return_tensors="pt"
+        )
+        with torch.no_grad():
+            hidden = model(**inputs).last_hidden_state
+        # Mean-pool over real tokens only, then normalize so a dot product is cosine similarity
+        mask = inputs["attention_mask"].unsqueeze(-1).float()
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        vectors.append(torch.nn.functional.normalize(pooled, dim=1).numpy().astype(np.float32))
+    return np.vstack(vectors)
+
+def _unindexed(conn, kinds):
+    # Items whose source row has no embedding yet, found with one anti-join per kind.
+    # Source rows and embedding rows are removed together (see forget), so equal counts
+    # mean the kind is fully indexed and the anti-join can be skipped.
+    items = []
+    for kind in kinds:
+        table, column = SOURCES[kind]
+        sources = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        indexed = conn.execute("SELECT COUNT(*) FROM embeddings WHERE kind = ?", (kind,)).fetchone()[0]
+        if sources == indexed:
+            continue
+        rows = conn.execute(
+            f"SELECT s.id, s.{column} AS text FROM {table} s "
+            "LEFT JOIN embeddings e ON e.kind = ? AND e.source_id = s.id "
+            "WHERE e.position IS NULL ORDER BY s.id",
+            (kind,),
+        )
+        items += [(kind, row["id"], row["text"]) for row in rows]
+    return items
+
+def sync_index(kinds=None):
+    """
+    Embeds journal entries and memories (or just the given kinds) saved since the last
+    sync and appends them to the vector file. Only new items go through the model.
+    Returns how many were added.
+    """
+    kinds = list(kinds or SOURCES)
+    conn = get_connection()
+    items = _unindexed(conn, kinds)
+    if not items:
+        return 0
+    vectors = embed_texts([text for _, _, text in items])
+
+    with conn:
+        # Another session may have indexed some of these while we were embedding
+        conn.execute("BEGIN IMMEDIATE")
+        still_missing = {(kind, source_id) for kind, source_id, _ in _unindexed(conn, kinds)}
+        keep = [i for i, (kind, source_id, _) in enumerate(items) if (kind, source_id) in still_missing]
+        if not keep:
+            return 0
+
+        start = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 AS next FROM embeddings").fetchone()["next"]
+        # Rows past the table's count are ignored by readers, so a crash here leaves the index consistent
+        with open(VECTORS_FILE, "r+b" if os.path.exists(VECTORS_FILE) else "w+b") as f:
+            f.seek(start * EMBEDDING_DIM * 4)
+            f.write(vectors[keep].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        conn.executemany(
+            "INSERT INTO embeddings (position, kind, source_id) VALUES (?, ?, ?)",
+            [(start + offset, items[i][0], items[i][1]) for offset, i in enumerate(keep)],
+        )
+    return len(keep)
+
+def forget(conn, kind, source_ids=None):
+    """
+    Drops the embeddings of the given source rows (or of every row of that kind).
+    Called inside the transaction that deletes the source rows, because SQLite can
+    reuse a deleted row's id and the new row must not inherit the old vector.
+    """
+    if source_ids is None:
+        conn.execute("DELETE FROM embeddings WHERE kind = ?", (kind,))
+    else:
+        conn.executemany(
+            "DELETE FROM embeddings WHERE kind = ? AND source_id = ?", [(kind, source_id) for source_id in source_ids]
+        )
+    # Tells readers their cached row metadata has gaps now
+    bump_version(conn, "embeddings:version")
+
+# Kind and source id per vector row (None and -1 for forgotten rows), extended
+# incrementally as the index grows and reloaded whenever rows were forgotten
+_rows = {"version": None, "kinds": np.zeros(0, dtype=object), "source_ids": np.zeros(0, dtype=np.int64)}
+_rows_lock = threading.Lock()
+
+def _row_metadata(conn):
+    with _rows_lock:
+        version = get_version(conn, "embeddings:version")
+        if version != _rows["version"]:
+            _rows.update(version=version, kinds=np.zeros(0, dtype=object), source_ids=np.zeros(0, dtype=np.int64))
+
+        known = len(_rows["source_ids"])
+        new_rows = conn.execute(
+            "SELECT position, kind, source_id FROM embeddings WHERE position >= ? ORDER BY position", (known,)
+        ).fetchall()
+        if new_rows:
+            size = new_rows[-1]["position"] + 1 - known
+            kinds = np.full(size, None, dtype=object)
+            source_ids = np.full(size, -1, dtype=np.int64)
+            offsets = [r["position"] - known for r in new_rows]
+            kinds[offsets] = [r["kind"] for r in new_rows]
+            source_ids[offsets] = [r["source_id"] for r in new_rows]
+            _rows["kinds"] = np.concatenate([_rows["kinds"], kinds])
+            _rows["source_ids"] = np.concatenate([_rows["source_ids"], source_ids])
+        return _rows["kinds"], _rows["source_ids"]
+
+def search(query, k=5, kinds=None):
+    """
+    Returns up to `k` indexed items most similar to `query`, best first, as
+    [{"kind", "id", "text", "score"}]. `kinds` restricts results, e.g. ("memory",).
+    """
+    kinds = list(kinds or SOURCES)
+    sync_index(kinds)
+    conn = get_connection()
+    row_kinds, source_ids = _row_metadata(conn)
+    # Only the rows of the wanted kinds are read from the vector file
+    positions = np.flatnonzero(np.isin(row_kinds, kinds))
+    if not len(positions):
+        return []
+
+    vectors = np.memmap(VECTORS_FILE, dtype=np.float32, mode="r", shape=(len(source_ids), EMBEDDING_DIM))
+    scores = vectors[positions] @ embed_texts([query])[0]
+
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    results = []
+    for i in top[np.argsort(-scores[top])]:
+        kind, source_id = row_kinds[positions[i]], int(source_ids[positions[i]])
+        table, column = SOURCES[kind]
+        row = conn.execute(f"SELECT {column} AS text FROM {table} WHERE id = ?", (source_id,)).fetchone()
+        if row:
+            results.append({"kind": kind, "id": source_id, "text": row["text"], "score": float(scores[i])})
+    return results
+
+def find_relevant_memory(text, min_score=MIN_RELEVANCE):
+    """
+    Returns the saved memory closest in meaning to `text`, or None if none is related
+    enough or the embedding model can't be loaded (e.g. offline on first run).
+    """
+    try:
+        results = search(text, k=1, kinds=("memory",))
+    except Exception:
+        return None
+    return results[0]["text"] if results and results[0]["score"] >= min_score else None
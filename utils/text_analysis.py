@@ -1,14 +1,68 @@
-from transformers import pipeline
+import argparse
+import io
+import os
+import re
+import time
+from utils.cache import LRUCache, content_key
+from utils.data_storage import rebuild_rollups
+from utils.db import bump_version, get_connection
+from utils.insights import rebuild_totals
+from utils.model_registry import register_model, get_model
 
-sentiment_pipeline = pipeline("sentiment-analysis", model="nlptown/bert-base-multilingual-uncased-sentiment")
+MODEL_NAME = "nlptown/bert-base-multilingual-uncased-sentiment"
+# Inference backend: "fp32" (reference) or "int8" (dynamically quantized, faster on CPU)
+SENTIMENT_BACKEND = os.environ.get("MINDSIGHT_SENTIMENT_BACKEND", "fp32")
+# Number of texts sent through the model in one forward pass
+BATCH_SIZE = 16
+# Longer entries are split into overlapping windows of the model's 512-token limit
+MAX_TOKENS = 512
+# Tokens shared by neighbouring windows, so a sentence cut at a boundary is still seen whole
+WINDOW_STRIDE = 128
+# Upper bound on windows scored per entry, which keeps latency flat for very long entries
+MAX_WINDOWS = 8
+# On-disk tier of the result cache; set MINDSIGHT_SENTIMENT_CACHE="" to keep it in memory only
+CACHE_PATH = os.environ.get("MINDSIGHT_SENTIMENT_CACHE", "sentiment_cache.sqlite")
 
-def analyze_text(entry):
-    result = sentiment_pipeline(entry)[0]
-    label = result.get('label', "3 stars")
-    
+# Results keyed by a hash of the model name and normalized text
+result_cache = LRUCache(maxsize=2048, disk_path=CACHE_PATH or None)
+
+def _load_sentiment_pipeline():
+    # Imported here so transformers/torch are only paid for on first analysis
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=MODEL_NAME)
+
+def _load_int8_sentiment_pipeline():
+    # Linear layers hold nearly all of BERT's weights and FLOPs, so quantizing
+    # just those to int8 gives most of the CPU speedup at a small accuracy cost
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME).eval()
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+# Registry model name for each backend
+BACKENDS = {
+    "fp32": "sentiment",
+    "int8": "sentiment-int8",
+}
+
+register_model("sentiment", _load_sentiment_pipeline)
+register_model("sentiment-int8", _load_int8_sentiment_pipeline)
+
+def get_sentiment_pipeline(backend=None):
+    """Returns the shared sentiment pipeline for a backend, loading it on first use."""
+    backend = backend or SENTIMENT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    return get_model(BACKENDS[backend])
+
+def _to_result(label):
+    # Turn a "N stars" model label into (simple label, numeric rating)
     try:
         numeric_rating = int(label.split()[0])
-    except:
+    except (AttributeError, IndexError, ValueError):
         numeric_rating = 3
         
     # Convert numeric rating to a simple label
@@ -19,4 +73,179 @@ def analyze_text(entry):
     else:
         simple_label = "Neutral"
         
-    return simple_label, numeric_rating
\ No newline at end of file
+    return simple_label, numeric_rating
+
+def _cache_key(entry, max_windows, backend):
+    # The model is uncased, so case and whitespace differences can't change its output
+    normalized = re.sub(r"\s+", " ", entry).strip().lower()
+    return content_key(MODEL_NAME, backend, str(max_windows), normalized)
+
+def _is_long(entry, tokenizer):
+    # Every token covers at least one character, so short strings can skip tokenization
+    if len(entry) <= MAX_TOKENS - 2:
+        return False
+    return len(tokenizer(entry)["input_ids"]) > MAX_TOKENS
+
+def _score_windowed(entry, max_windows=MAX_WINDOWS, backend=None):
+    """
+    Scores a long entry as overlapping token windows in a single batched forward pass.
+    Window probabilities are averaged, weighted by each window's real token count.
+    """
+    import torch
+
+    sentiment_pipeline = get_sentiment_pipeline(backend)
+    tokenizer, model = sentiment_pipeline.tokenizer, sentiment_pipeline.model
+    windows = tokenizer(
+        entry, truncation=True, max_length=MAX_TOKENS, stride=WINDOW_STRIDE,
+        return_overflowing_tokens=True, padding=True, return_tensors="pt"
+    )
+    windows.pop("overflow_to_sample_mapping", None)
+
+    # Past the cap, keep evenly spaced windows so the whole entry is still represented
+    window_count = windows["input_ids"].shape[0]
+    if window_count > max_windows:
+        keep = torch.linspace(0, window_count - 1, max_windows).round().long()
+        windows = {name: tensor[keep] for name, tensor in windows.items()}
+    windows = {name: tensor.to(model.device) for name, tensor in windows.items()}
+
+    with torch.no_grad():
+        probabilities = torch.softmax(model(**windows).logits, dim=-1)
+    weights = windows["attention_mask"].sum(dim=1, keepdim=True).float()
+    averaged = (probabilities * weights).sum(dim=0) / weights.sum()
+
+    return _to_result(model.config.id2label[int(averaged.argmax())])
+
+def analyze_text(entry, max_windows=MAX_WINDOWS, backend=None):
+    return analyze_texts([entry], max_windows=max_windows, backend=backend)[0]
+
+def analyze_texts(entries, batch_size=BATCH_SIZE, max_windows=MAX_WINDOWS, backend=None):
+    """
+    Scores a list of texts, returning (simple label, numeric rating) tuples in input order.
+    Cached texts are answered without the model; entries over the model's token limit are
+    scored window by window, and the rest are sorted by length before batching so each
+    batch is padded only to its own longest member.
+    """
+    backend = backend or SENTIMENT_BACKEND
+    results = [None] * len(entries)
+    pending = {}
+    for i, entry in enumerate(entries):
+        key = _cache_key(entry, max_windows, backend)
+        cached = result_cache.get(key)
+        if cached is not None:
+            results[i] = tuple(cached)
+        else:
+            pending.setdefault(key, []).append(i)
+
+    if not pending:
+        return results
+
+    sentiment_pipeline = get_sentiment_pipeline(backend)
+    for key in [k for k in pending if _is_long(entries[pending[k][0]], sentiment_pipeline.tokenizer)]:
+        result = _score_windowed(entries[pending[key][0]], max_windows, backend)
+        result_cache.put(key, result)
+        for i in pending.pop(key):
+            results[i] = result
+
+    # One representative text per key, so duplicates in the input are scored once
+    keys = sorted(pending, key=lambda k: len(entries[pending[k][0]]))
+    for start in range(0, len(keys), batch_size):
+        bucket = keys[start:start + batch_size]
+        outputs = sentiment_pipeline(
+            [entries[pending[k][0]] for k in bucket], batch_size=len(bucket), truncation=True
+        )
+        for key, output in zip(bucket, outputs):
+            result = _to_result(output.get('label', "3 stars"))
+            result_cache.put(key, result)
+            for i in pending[key]:
+                results[i] = result
+    return results
+
+def rescore_journal(batch_size=32):
+    """Re-scores every saved journal entry with the current model, e.g. after a model change."""
+    conn = get_connection()
+    rows = conn.execute("SELECT id, entry FROM journal ORDER BY id").fetchall()
+
+    results = analyze_texts([row["entry"] for row in rows], batch_size=batch_size)
+    with conn:
+        conn.executemany(
+            "UPDATE journal SET score = ? WHERE id = ?",
+            [(numeric_rating, row["id"]) for row, (_, numeric_rating) in zip(rows, results)],
+        )
+        rebuild_totals(conn)
+        rebuild_rollups(conn)
+        bump_version(conn, "journal:version")
+    return len(rows)
+
+def _model_size_mb(model):
+    # Serialized weights; quantized layers keep packed params that parameters() doesn't list
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 1e6
+
+def _class_probabilities(sentiment_pipeline, texts):
+    # Full probability vectors, ordered by label, for comparing backends
+    outputs = sentiment_pipeline(texts, batch_size=BATCH_SIZE, truncation=True, top_k=None)
+    return [[s["score"] for s in sorted(output, key=lambda s: s["label"])] for output in outputs]
+
+def compare_backends(texts, backends=("fp32", "int8"), reference="fp32", repeats=3):
+    """
+    Runs the same texts through each backend (bypassing the result cache) and reports
+    load time, weight size, latency per text, and parity against the reference backend.
+    """
+    from utils.model_registry import get_load_times
+
+    if not texts:
+        raise ValueError("compare_backends needs at least one text.")
+    report = {}
+    probabilities = {}
+    for backend in backends:
+        sentiment_pipeline = get_sentiment_pipeline(backend)
+        _class_probabilities(sentiment_pipeline, texts[:1])  # warm-up
+
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            probabilities[backend] = _class_probabilities(sentiment_pipeline, texts)
+        elapsed = (time.perf_counter() - start_time) / repeats
+
+        report[backend] = {
+            "load_seconds": get_load_times().get(BACKENDS[backend]),
+            "size_mb": _model_size_mb(sentiment_pipeline.model),
+            "ms_per_text": elapsed * 1000 / len(texts),
+        }
+
+    for backend in backends:
+        pairs = list(zip(probabilities[backend], probabilities[reference]))
+        report[backend]["label_agreement"] = sum(
+            p.index(max(p)) == r.index(max(r)) for p, r in pairs
+        ) / len(pairs)
+        report[backend]["max_probability_delta"] = max(
+            abs(a - b) for p, r in pairs for a, b in zip(p, r)
+        )
+        report[backend]["speedup"] = report[reference]["ms_per_text"] / report[backend]["ms_per_text"]
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk sentiment tools for the MindSight journal.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    rescore = subcommands.add_parser("rescore", help="Re-score every entry in the journal log.")
+    rescore.add_argument("--batch-size", type=int, default=32)
+    compare = subcommands.add_parser("compare", help="Compare backend latency, size and parity on journal entries.")
+    compare.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.command == "rescore":
+        start_time = time.perf_counter()
+        count = rescore_journal(batch_size=args.batch_size)
+        print(f"Re-scored {count} entries in {time.perf_counter() - start_time:.1f}s")
+    elif args.command == "compare":
+        rows = get_connection().execute("SELECT entry FROM journal ORDER BY id DESC LIMIT ?", (args.limit,))
+        texts = [row["entry"] for row in rows]
+        for backend, numbers in compare_backends(texts).items():
+            print(
+                f"{backend:>5}: {numbers['ms_per_text']:.1f} ms/text ({numbers['speedup']:.2f}x), "
+                f"{numbers['size_mb']:.0f} MB weights, loaded in {numbers['load_seconds']:.1f}s, "
+                f"label agreement {numbers['label_agreement']:.1%}, "
+                f"max probability delta {numbers['max_probability_delta']:.3f}"
+            )
@@ -1,33 +1,151 @@
-import torch
 import numpy as np
-import soundfile as sf
-from transformers import Wav2Vec2FeatureExtractor, Wav2Vec2ForSequenceClassification
+from utils.model_registry import register_model, get_model
 
 MODEL_NAME = "superb/wav2vec2-base-superb-er"
 
-# Load feature extractor + model
-extractor = Wav2Vec2FeatureExtractor.from_pretrained(MODEL_NAME)
-model = Wav2Vec2ForSequenceClassification.from_pretrained(MODEL_NAME)
+# Long recordings are analyzed in fixed windows rather than as one sequence, whose
+# cost grows faster than its length; this many windows go through the model at once
+WINDOW_SECONDS = 5.0
+WINDOW_HOP_SECONDS = 5.0
+WINDOW_BATCH_SIZE = 4
 
-# SER labels from HuggingFace config
-id2label = model.config.id2label
+# Voice activity detection: silent frames are cut before the model sees the audio.
+# A frame is speech when its RMS energy clears VAD_ENERGY_RATIO times the recording's
+# quietest frames (and at least VAD_MIN_RMS), or half that for frames whose
+# zero-crossing rate looks like unvoiced consonants (s, f, sh)
+VAD_FRAME_SECONDS = 0.03
+VAD_ENERGY_RATIO = 3.0
+VAD_MIN_RMS = 0.005
+VAD_ZCR_THRESHOLD = 0.3
+# Frames kept on either side of speech so word onsets and endings aren't clipped
+VAD_HANGOVER_SECONDS = 0.2
 
-def get_voice_emotion(audio_path):
-    # Load audio
-    speech, rate = sf.read(audio_path)
-    if len(speech.shape) > 1:
-        speech = np.mean(speech, axis=1)  # convert stereo → mono
+def _load_voice_model():
+    # Imported here so torch/transformers are only paid for on first analysis
+    from transformers import Wav2Vec2FeatureExtractor, Wav2Vec2ForSequenceClassification
+
+    # Load feature extractor + model
+    extractor = Wav2Vec2FeatureExtractor.from_pretrained(MODEL_NAME)
+    model = Wav2Vec2ForSequenceClassification.from_pretrained(MODEL_NAME)
+    return extractor, model
+
+register_model("voice_emotion", _load_voice_model)
+
+def _prepare(speech, sample_rate, target_rate):
+    # Mono float32 at the model's rate; resampling only happens when the rates differ
+    speech = np.asarray(speech, dtype=np.float32)
+    if speech.ndim > 1:
+        speech = speech.mean(axis=1)  # convert stereo → mono
+    if sample_rate != target_rate:
+        import librosa
+
+        speech = librosa.resample(speech, orig_sr=sample_rate, target_sr=target_rate)
+    return speech
+
+def detect_speech(speech, rate):
+    """
+    Energy/zero-crossing VAD over a mono recording. Returns (speech_frames, frame_length):
+    a boolean per VAD_FRAME_SECONDS frame (the last one zero-padded) and the frame size in samples.
+    """
+    frame = max(1, int(VAD_FRAME_SECONDS * rate))
+    frames = np.pad(speech, (0, -len(speech) % frame)).reshape(-1, frame)
+
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    zcr = np.mean(np.abs(np.diff(np.signbit(frames), axis=1)), axis=1)
+    threshold = max(VAD_MIN_RMS, VAD_ENERGY_RATIO * np.percentile(rms, 10))
+    voiced = (rms > threshold) | ((rms > threshold / 2) & (zcr > VAD_ZCR_THRESHOLD))
+
+    hangover = int(VAD_HANGOVER_SECONDS / VAD_FRAME_SECONDS)
+    if hangover:
+        voiced = np.convolve(voiced, np.ones(2 * hangover + 1), mode="same") > 0
+    return voiced, frame
 
-    # Preprocess audio
-    inputs = extractor(speech, sampling_rate=rate, return_tensors="pt", padding=True)
+def _window_starts(length, window, hop):
+    # Every window is `window` samples long; the last one is moved back to end with the
+    # audio instead of being padded. Audio shorter than one window is a single window.
+    if length <= window:
+        return [0]
+    starts = list(range(0, length - window, hop))
+    return starts + [length - window]
 
-    # Get logits
-    with torch.no_grad():
-        logits = model(**inputs).logits
+def analyze_voice(speech, sample_rate, window_seconds=WINDOW_SECONDS, hop_seconds=WINDOW_HOP_SECONDS,
+                  batch_size=WINDOW_BATCH_SIZE, vad=True):
+    """
+    Detects emotions in an in-memory recording (a NumPy array, mono or (samples, channels),
+    at any sample rate) window by window, batch_size windows per model call so peak memory
+    stays flat however long the recording is. With `vad`, silence is cut out first.
+    Returns {"emotion", "confidence", "timeline", "speech_seconds", "skipped_seconds"},
+    where the overall emotion averages the windows' probabilities and the timeline has
+    {"start", "end", "emotion", "confidence"} per window (seconds into the original recording).
+    """
+    import torch
 
+    extractor, model = get_model("voice_emotion")
+    # SER labels from HuggingFace config
+    id2label = model.config.id2label
+    rate = extractor.sampling_rate
+    speech = _prepare(speech, sample_rate, rate)
+    total = len(speech)
+
+    # Positions in the trimmed audio map back to the original through the kept frames
+    frame = max(total, 1)
+    kept_frames = np.zeros(1, dtype=int)
+    if vad and total:
+        voiced, vad_frame = detect_speech(speech, rate)
+        # With no speech found at all, analyze everything rather than nothing
+        if voiced.any():
+            frame, kept_frames = vad_frame, np.flatnonzero(voiced)
+            padding = -total % frame
+            speech = np.pad(speech, (0, padding)).reshape(-1, frame)[kept_frames].ravel()
+            if kept_frames[-1] == len(voiced) - 1:
+                speech = speech[:len(speech) - padding]
+
+    def original_seconds(position, end=False):
+        position -= end
+        sample = kept_frames[position // frame] * frame + position % frame + end
+        return round(float(min(sample, total)) / rate, 2)
+
+    window = int(window_seconds * rate)
+    starts = _window_starts(len(speech), window, int(hop_seconds * rate))
+    probabilities = []
+    for i in range(0, len(starts), batch_size):
+        batch = [speech[start:start + window] for start in starts[i:i + batch_size]]
+        # Preprocess audio
+        inputs = extractor(batch, sampling_rate=rate, return_tensors="pt", padding=True)
+        # Get logits
+        with torch.no_grad():
+            logits = model(**inputs).logits
+        probabilities.append(torch.softmax(logits, dim=-1).numpy())
+    probabilities = np.concatenate(probabilities)
+
+    timeline = [
+        {
+            "start": original_seconds(start),
+            "end": original_seconds(min(start + window, len(speech)), end=True),
+            "emotion": id2label[int(p.argmax())],
+            "confidence": round(float(p.max()) * 100, 2),
+        }
+        for start, p in zip(starts, probabilities)
+    ]
     # Prediction
-    predicted_id = torch.argmax(logits, dim=-1).item()
-    emotion = id2label[predicted_id]
-    score = torch.softmax(logits, dim=-1)[0][predicted_id].item()
+    overall = probabilities.mean(axis=0)
+    return {
+        "emotion": id2label[int(overall.argmax())],
+        "confidence": round(float(overall.max()) * 100, 2),
+        "timeline": timeline,
+        "speech_seconds": round(len(speech) / rate, 2),
+        "skipped_seconds": round((total - len(speech)) / rate, 2),
+    }
 
-    return emotion, round(score * 100, 2)
+def get_voice_emotion_from_array(speech, sample_rate):
+    """Detects the overall emotion in an in-memory recording. Returns (emotion, confidence %)."""
+    result = analyze_voice(speech, sample_rate)
+    return result["emotion"], result["confidence"]
+
+def get_voice_emotion(audio_path):
+    # Only file input needs soundfile; recordings go straight to get_voice_emotion_from_array
+    import soundfile as sf
+
+    # Load audio
+    speech, rate = sf.read(audio_path, dtype="float32")
+    return get_voice_emotion_from_array(speech, rate)